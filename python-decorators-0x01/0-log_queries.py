@@ -1,14 +1,17 @@
 import sqlite3
-import functools
-from datetime import datetime
+import logging
+from query_profiler import default_profiler, profiled
 
-def log_queries(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        query = kwargs.get('query', args[0] if args else None)
-        print(f"Executing SQL query: {query}")
-        return func(*args, **kwargs)
-    return wrapper
+def log_queries(func=None, *, profiler=None):
+    """Profile the queries func runs instead of printing them
+
+    Wall time, rows returned and the caller of every query are recorded by
+    query_profiler (default_profiler unless another is given); slow queries
+    are logged on the 'query_profiler' logger.
+    """
+    if func is None:
+        return lambda f: log_queries(f, profiler=profiler)
+    return profiled(func, profiler=profiler)
 
 @log_queries
 def fetch_all_users(query):
@@ -19,4 +22,10 @@ def fetch_all_users(query):
     conn.close()
     return results
 
-users = fetch_all_users(query="SELECT * FROM users") 
\ No newline at end of file
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    #### fetch users while profiling the query
+    users = fetch_all_users(query="SELECT * FROM users")
+    for query, stats in default_profiler.summary().items():
+        print(f"{query}: {stats['count']} call(s), p50 {stats['p50'] * 1000:.2f} ms")
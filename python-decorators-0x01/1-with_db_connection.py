@@ -1,26 +1,39 @@
-import sqlite3 
 import functools
+from connection_pool import get_pool
+
+def with_db_connection(func=None, *, pool=None):
+    """Pass a database connection to func as its first argument
+
+    Connections come from connection_pool: by default a new one is opened
+    and closed around every call; after configure_pool(mode='thread') or
+    configure_pool(mode='pooled', max_size=N) they are reused and reset
+    between calls. Use @with_db_connection(pool=...) to pick a specific
+    SQLitePool.
+    """
+    if func is None:
+        return lambda f: with_db_connection(f, pool=pool)
 
-def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Create a new database connection
-        conn = sqlite3.connect('users.db')
+        # Get a database connection (new, per-thread or pooled)
+        connections = pool if pool is not None else get_pool()
+        conn = connections.acquire()
         try:
             # Call the function with the connection as first argument
             result = func(conn, *args, **kwargs)
             return result
         finally:
-            # Always close the connection, even if an error occurs
-            conn.close()
+            # Always hand the connection back, even if an error occurs
+            connections.release(conn)
     return wrapper
 
-@with_db_connection 
-def get_user_by_id(conn, user_id): 
-    cursor = conn.cursor() 
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,)) 
-    return cursor.fetchone() 
+@with_db_connection
+def get_user_by_id(conn, user_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    return cursor.fetchone()
 
-#### Fetch user by ID with automatic connection handling 
-user = get_user_by_id(user_id=1)
-print(user) 
\ No newline at end of file
+if __name__ == "__main__":
+    #### Fetch user by ID with automatic connection handling
+    user = get_user_by_id(user_id=1)
+    print(user)
@@ -1,5 +1,6 @@
 import sqlite3 
 import functools
+from query_cache import default_cache, tables_written
 
 def with_db_connection(func):
     @functools.wraps(func)
@@ -15,19 +16,44 @@ def with_db_connection(func):
             conn.close()
     return wrapper
 
-def transactional(func):
+def transactional(func=None, *, cache=None):
+    """Commit on success, roll back on error
+
+    Every statement run inside the transaction is traced to collect the
+    tables it writes; after a successful commit the cached reads of those
+    tables are invalidated (in cache, default the shared query cache). A
+    rolled back transaction changed nothing, so it invalidates nothing.
+    """
+    if func is None:
+        return lambda f: transactional(f, cache=cache)
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        written = set()
+        unknown = []
+
+        def trace(statement):
+            tables = tables_written(statement)
+            if tables is None:
+                unknown.append(statement)
+            else:
+                written.update(tables)
+
+        conn.set_trace_callback(trace)
         try:
             # Start a transaction
             result = func(conn, *args, **kwargs)
             # If no error occurred, commit the transaction
             conn.commit()
-            return result
         except Exception as e:
             # If an error occurred, rollback the transaction
             conn.rollback()
             raise e
+        finally:
+            conn.set_trace_callback(None)
+        target = cache if cache is not None else default_cache
+        target.invalidate_tables(None if unknown else written)
+        return result
     return wrapper
 
 @with_db_connection 
@@ -36,5 +62,6 @@ def update_user_email(conn, user_id, new_email):
     cursor = conn.cursor() 
     cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id)) 
 
-#### Update user's email with automatic transaction handling 
-update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com') 
\ No newline at end of file
+if __name__ == "__main__":
+    #### Update user's email with automatic transaction handling 
+    update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
@@ -1,6 +1,6 @@
-import time
-import sqlite3 
+import sqlite3
 import functools
+from retry_policy import RetryPolicy
 
 def with_db_connection(func):
     @functools.wraps(func)
@@ -16,22 +16,19 @@ def with_db_connection(func):
             conn.close()
     return wrapper
 
-def retry_on_failure(retries=3, delay=2):
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            last_exception = None
-            for attempt in range(retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    last_exception = e
-                    if attempt < retries - 1:  # Don't sleep on the last attempt
-                        time.sleep(delay)
-            # If we get here, all retries failed
-            raise last_exception
-        return wrapper
-    return decorator
+def retry_on_failure(retries=3, delay=2, policy=None):
+    """Retry transient database errors up to `retries` attempts in total
+
+    Waits start at `delay` seconds and back off exponentially with jitter;
+    errors that a retry can't fix (syntax errors, ProgrammingError, ...)
+    are raised at once. Pass a retry_policy.RetryPolicy as policy for a
+    deadline, other error classes or a separate retry budget. Works on
+    async functions too, without blocking the event loop.
+    """
+    if policy is None:
+        policy = RetryPolicy(attempts=retries, base_delay=delay, max_delay=max(delay, 30))
+    # A policy decorates plain and async functions alike
+    return policy
 
 @with_db_connection
 @retry_on_failure(retries=3, delay=1)
@@ -40,6 +37,8 @@ def fetch_users_with_retry(conn):
     cursor.execute("SELECT * FROM users")
     return cursor.fetchall()
 
-#### attempt to fetch users with automatic retry on failure
-users = fetch_users_with_retry()
-print(users) 
\ No newline at end of file
+if __name__ == "__main__":
+    #### attempt to fetch users with automatic retry on failure
+    users = fetch_users_with_retry()
+    print(users)
+ 
\ No newline at end of file
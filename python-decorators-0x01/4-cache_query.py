@@ -1,36 +1,74 @@
 import time
-import sqlite3 
+import sqlite3
 import functools
+from query_cache import default_cache, make_key, tables_read
 
-query_cache = {}
+# LRU cache bounded by entries and bytes, with a TTL per entry; shared
+# with transactional, whose commits invalidate the tables they wrote
+query_cache = default_cache
 
-def cache_query(func):
+def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Get the query from either kwargs or args
+        # Create a new database connection
+        conn = sqlite3.connect('users.db')
+        try:
+            # Call the function with the connection as first argument
+            result = func(conn, *args, **kwargs)
+            return result
+        finally:
+            # Always close the connection, even if an error occurs
+            conn.close()
+    return wrapper
+
+def cache_query(func=None, *, cache=None, ttl=None):
+    """Cache results by query and parameters
+
+    Use as @cache_query, or @cache_query(cache=..., ttl=...) to pick the
+    QueryCache and the entry TTL in seconds. Each entry records the tables
+    its query reads, so writes committed through transactional drop just
+    the entries they made stale.
+    """
+    if func is None:
+        return lambda f: cache_query(f, cache=cache, ttl=ttl)
+    cache = cache if cache is not None else query_cache
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Get the query and its parameters from either kwargs or args
         query = kwargs.get('query', args[1] if len(args) > 1 else None)
-        
+        params = kwargs.get('params', args[2] if len(args) > 2 else None)
+        key = make_key(query, params)
+
         # If query is in cache, return cached result
-        if query in query_cache:
+        missing = object()
+        result = cache.get(key, missing)
+        if result is not missing:
             print("Using cached result for query:", query)
-            return query_cache[query]
-        
-        # If not in cache, execute query and cache the result
+            return result
+
+        # If not in cache, execute query and cache the result, unless one
+        # of its tables was written while it ran
+        tables = tables_read(query)
+        token = cache.snapshot(tables)
         result = func(*args, **kwargs)
-        query_cache[query] = result
+        cache.set(key, result, ttl, tables=tables, token=token)
         print("Caching result for query:", query)
         return result
+    wrapper.cache = cache
     return wrapper
 
 @with_db_connection
 @cache_query
-def fetch_users_with_cache(conn, query):
+def fetch_users_with_cache(conn, query, params=()):
     cursor = conn.cursor()
-    cursor.execute(query)
+    cursor.execute(query, params)
     return cursor.fetchall()
 
-#### First call will cache the result
-users = fetch_users_with_cache(query="SELECT * FROM users")
+if __name__ == "__main__":
+    #### First call will cache the result
+    users = fetch_users_with_cache(query="SELECT * FROM users")
 
-#### Second call will use the cached result
-users_again = fetch_users_with_cache(query="SELECT * FROM users") 
\ No newline at end of file
+    #### Second call will use the cached result
+    users_again = fetch_users_with_cache(query="SELECT * FROM users")
+    print(query_cache.stats())
@@ -0,0 +1,60 @@
+import argparse
+import threading
+import time
+
+from connection_pool import POOL_MODES, SQLitePool
+
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+
+
+def calls_per_second(mode, path='users.db', calls=5000, threads=1, max_size=5):
+    """Calls/s of a with_db_connection lookup by id using the given pool mode
+
+    The calls are split evenly over threads; returns (calls/s, pool stats).
+    """
+    pool = SQLitePool(path, max_size=max_size, mode=mode)
+
+    @with_db_connection(pool=pool)
+    def get_user_by_id(conn, user_id):
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+        return cursor.fetchone()
+
+    per_thread = calls // threads
+
+    def run():
+        for i in range(per_thread):
+            get_user_by_id(user_id=i % 100 + 1)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    stats = pool.stats()
+    pool.close()
+    return per_thread * threads / elapsed, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare with_db_connection calls/s per pool mode")
+    parser.add_argument('--path', default='users.db', help="SQLite database with a users table")
+    parser.add_argument('--calls', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--max-size', type=int, default=5, help="connections in pooled mode")
+    parser.add_argument('--modes', nargs='+', choices=POOL_MODES, default=list(POOL_MODES))
+    args = parser.parse_args(argv)
+
+    baseline = None
+    print(f"{'mode':<10} {'calls/s':>12} {'speedup':>8} {'opened':>7}")
+    for mode in args.modes:
+        rate, stats = calls_per_second(mode, args.path, args.calls, args.threads, args.max_size)
+        baseline = baseline or rate
+        print(f"{mode:<10} {rate:>12,.0f} {rate / baseline:>7.1f}x {stats['opened']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+POOL_MODES = ('per_call', 'thread', 'pooled')
+
+# Connection settings put back before a connection is reused
+_DEFAULTS = {'row_factory': None, 'text_factory': str}
+
+
+class SQLitePool:
+    """Hands out SQLite connections to with_db_connection
+
+    mode='per_call' opens and closes a connection around every call (the
+    original behaviour). mode='thread' keeps one connection per thread and
+    mode='pooled' keeps up to max_size connections shared by all threads,
+    so repeated calls skip reopening the file and re-reading the schema and
+    keep SQLite's page cache warm. Either way at most max_size connections
+    are open; in thread mode the connection of a thread that has exited is
+    closed to make room for new threads. Reused connections are reset when they
+    come back: an open transaction is rolled back and row_factory,
+    text_factory, isolation_level and the trace callback are restored. In
+    thread mode nested calls on one thread share its connection, and only
+    the outermost call's release resets it.
+    """
+
+    def __init__(self, path='users.db', max_size=5, mode='per_call', timeout=30, **connect_kwargs):
+        if mode not in POOL_MODES:
+            raise ValueError(f"mode must be one of {POOL_MODES}")
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.path = path
+        self.max_size = max_size
+        self.mode = mode
+        self.timeout = timeout
+        self.connect_kwargs = connect_kwargs
+        self.isolation_level = connect_kwargs.get('isolation_level', '')
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all = []
+        self._threads = {}  # thread -> its connection, in thread mode
+        self._pid = os.getpid()
+        self._counters = {'opened': 0, 'reused': 0, 'discarded': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _open(self):
+        # Pooled connections move between threads, one user at a time, and
+        # a thread's connection is closed by another thread once it exits
+        kwargs = dict(self.connect_kwargs)
+        if self.mode != 'per_call':
+            kwargs.setdefault('check_same_thread', False)
+        conn = sqlite3.connect(self.path, **kwargs)
+        self._count('opened')
+        if self.mode != 'per_call':
+            with self._lock:
+                self._all.append(conn)
+        return conn
+
+    def _reset(self, conn):
+        """Return a connection to a clean state; False if it is unusable"""
+        try:
+            conn.set_trace_callback(None)
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = _DEFAULTS['row_factory']
+            conn.text_factory = _DEFAULTS['text_factory']
+            conn.isolation_level = self.isolation_level
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        self._count('discarded')
+        with self._lock:
+            if conn in self._all:
+                self._all.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _reap(self):
+        """Close the connections of threads that have exited"""
+        with self._lock:
+            dead = [thread for thread in self._threads if not thread.is_alive()]
+            connections = [self._threads.pop(thread) for thread in dead]
+        for conn in connections:
+            self._discard(conn)
+            self._slots.release()
+
+    def _take_slot(self):
+        if self.mode != 'thread':
+            if not self._slots.acquire(timeout=self.timeout):
+                raise TimeoutError(f"No SQLite connection free after {self.timeout}s")
+            return
+        # A slot may be held by a thread that exits while we wait
+        deadline = time.monotonic() + self.timeout
+        while True:
+            self._reap()
+            remaining = deadline - time.monotonic()
+            if self._slots.acquire(timeout=max(min(remaining, 0.05), 0)):
+                return
+            if remaining <= 0:
+                raise TimeoutError(f"No SQLite connection free after {self.timeout}s")
+
+    def acquire(self):
+        if self.mode == 'per_call':
+            return self._open()
+        if self.mode == 'thread':
+            conn = getattr(self._local, 'conn', None)
+            if conn is not None:
+                # Nested calls on this thread share the connection
+                self._local.depth += 1
+                self._count('reused')
+                return conn
+            self._take_slot()
+            try:
+                conn = self._open()
+            except BaseException:
+                self._slots.release()
+                raise
+            self._local.conn = conn
+            self._local.depth = 1
+            with self._lock:
+                self._threads[threading.current_thread()] = conn
+            return conn
+        self._take_slot()
+        try:
+            conn = self._idle.get_nowait()
+            self._count('reused')
+            return conn
+        except queue.Empty:
+            pass
+        try:
+            return self._open()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        if self.mode == 'per_call':
+            conn.close()
+            return
+        if self.mode == 'thread':
+            # Only the outermost call resets; an inner one would roll back
+            # the transaction its caller still has open
+            depth = getattr(self._local, 'depth', 1) - 1
+            self._local.depth = depth
+            if depth > 0:
+                return
+            if not self._reset(conn):
+                self._local.conn = None
+                with self._lock:
+                    held = self._threads.pop(threading.current_thread(), None)
+                self._discard(conn)
+                # close() may already have given the slot back
+                if held is not None:
+                    self._slots.release()
+            return
+        if self._reset(conn):
+            self._idle.put(conn)
+        else:
+            self._discard(conn)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, mode=self.mode, open=len(self._all),
+                        max_size=self.max_size)
+
+    def close(self):
+        """Close every connection the pool has opened"""
+        with self._lock:
+            connections, self._all = self._all, []
+            held, self._threads = len(self._threads), {}
+        for _ in range(held):
+            self._slots.release()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        self._local = threading.local()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_options = {}
+
+
+def configure_pool(**options):
+    """Set the path, max_size, mode, ... used by with_db_connection"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _options.clear()
+        _options.update(options)
+        _pool = SQLitePool(**options)
+    return _pool
+
+
+def get_pool():
+    """The shared pool, created on first use (and again after a fork)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._pid != os.getpid():
+            _pool = SQLitePool(**_options)
+        return _pool
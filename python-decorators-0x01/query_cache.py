@@ -0,0 +1,228 @@
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+_NAME = r'[`"\[]?(?:\w+[`"\]]?\.)?[`"\[]?(\w+)[`"\]]?'
+_READ_TABLES = re.compile(r'\b(?:FROM|JOIN)\s+' + _NAME + r'((?:\s*,\s*' + _NAME + r')*)',
+                          re.IGNORECASE)
+_MORE_TABLES = re.compile(r',\s*' + _NAME)
+_WRITE_TABLE = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?'
+    r'|DELETE\s+FROM|(?:CREATE|DROP|ALTER)\s+TABLE(?:\s+IF(?:\s+NOT)?\s+EXISTS)?)\s+'
+    + _NAME, re.IGNORECASE)
+_NON_WRITES = re.compile(r'^\s*(?:SELECT|BEGIN|COMMIT|END|ROLLBACK|SAVEPOINT|RELEASE'
+                         r'|PRAGMA|EXPLAIN|VALUES)\b', re.IGNORECASE)
+
+
+def tables_read(query):
+    """Names of the tables a SELECT reads (FROM and JOIN clauses,
+    subqueries included), or None if none can be found"""
+    tables = set()
+    for match in _READ_TABLES.finditer(query or ''):
+        tables.add(match.group(1).lower())
+        tables.update(name.lower() for name in _MORE_TABLES.findall(match.group(2)))
+    return tables or None
+
+
+def tables_written(statement):
+    """Tables a statement writes: an empty set for reads and transaction
+    control, None for a write whose target can't be determined"""
+    if _NON_WRITES.match(statement):
+        return set()
+    match = _WRITE_TABLE.match(statement)
+    if match is None:
+        # e.g. a trigger body or a WITH ... INSERT: assume it can write anything
+        return None
+    return {match.group(1).lower()}
+
+
+def estimate_size(value):
+    """Rough size in bytes of a query result (lists/tuples of plain values)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return size
+
+
+def make_key(query, params=None):
+    """Cache key for a query and its parameters
+
+    Positional parameters become a tuple and named ones a sorted tuple of
+    items, so the same query with different parameters gets its own entry.
+    """
+    if params is None:
+        return (query, ())
+    if isinstance(params, dict):
+        return (query, tuple(sorted(params.items())))
+    return (query, tuple(params))
+
+
+class QueryCache:
+    """Thread-safe LRU cache for query results with a TTL per entry
+
+    The least recently used entries are evicted once there are more than
+    max_entries of them or their estimated size passes max_bytes. Entries
+    older than their ttl (seconds; None means no expiry) count as misses
+    and are dropped when found. A result bigger than max_bytes on its own
+    is not cached at all.
+
+    Entries can record the tables they were read from; invalidate_tables
+    then drops only the entries depending on the tables a write touched.
+    Entries with unknown tables are dropped by every invalidation.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=16 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # table -> keys of the entries read from it; None holds the keys
+        # whose tables are unknown
+        self._dependents = {}
+        self._tables = {}  # key -> its tables (or None)
+        # Bumped on every invalidation of a table, so a result read before
+        # a write but stored after it can be recognised as stale
+        self._generations = {}
+        self._writes = 0
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+        tables = self._tables.pop(key, None)
+        for table in tables if tables is not None else (None,):
+            keys = self._dependents.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._dependents[table]
+
+    def _token(self, tables):
+        if tables is None:
+            return (self._epoch, self._writes)
+        return (self._epoch, tuple(self._generations.get(t, 0) for t in sorted(tables)))
+
+    def snapshot(self, tables=None):
+        """Token to pass to set() for a result about to be read from tables"""
+        tables = frozenset(t.lower() for t in tables) if tables is not None else None
+        with self._lock:
+            return self._token(tables)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, _, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None, tables=None, token=None):
+        """Store value under key; ttl overrides the cache's default
+
+        tables are the tables value was read from (None: unknown). token,
+        from snapshot() taken before the read, makes set() refuse the value
+        if one of those tables was written in the meantime.
+        """
+        size = estimate_size(value)
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        tables = frozenset(t.lower() for t in tables) if tables is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return False
+            if token is not None and token != self._token(tables):
+                return False
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            self._tables[key] = tables
+            for table in tables if tables is not None else (None,):
+                self._dependents.setdefault(table, set()).add(key)
+            while (len(self._entries) > self.max_entries
+                   or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            return True
+
+    def invalidate_tables(self, tables):
+        """Drop the entries read from any of tables; None drops everything
+
+        Returns the number of entries removed.
+        """
+        with self._lock:
+            if tables is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._dependents.clear()
+                self._tables.clear()
+                self._bytes = 0
+                self._epoch += 1
+                self.invalidations += removed
+                return removed
+            self._writes += 1
+            keys = set(self._dependents.get(None, ()))
+            for table in tables:
+                table = table.lower()
+                self._generations[table] = self._generations.get(table, 0) + 1
+                keys.update(self._dependents.get(table, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[2] is None or time.monotonic() < entry[2])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dependents.clear()
+            self._tables.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+# Shared by cache_query and transactional, so committed writes invalidate
+# the cached reads of the tables they touched
+default_cache = QueryCache()
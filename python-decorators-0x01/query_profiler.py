@@ -0,0 +1,197 @@
+import functools
+import logging
+import math
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+
+logger = logging.getLogger('query_profiler')
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b')
+_PLACEHOLDER_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACES = re.compile(r'\s+')
+
+# One profiled call; duration is in seconds and rows is None when the
+# result isn't something rows can be counted from
+QueryRecord = namedtuple('QueryRecord',
+                         'query normalized started_at duration rows function caller error')
+
+
+def normalize_query(query):
+    """Query with its literals replaced by ?, so calls differing only in
+    their values are grouped together"""
+    query = _STRINGS.sub('?', query)
+    query = _NUMBERS.sub('?', query)
+    query = _PLACEHOLDER_LISTS.sub('(?...)', query)
+    return _SPACES.sub(' ', query).strip()
+
+
+def count_rows(result):
+    """Rows in a query result: fetchall() lists, one fetchone() row or None"""
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple):
+        return 1
+    return None
+
+
+def _find_query(args, kwargs):
+    query = kwargs.get('query')
+    if query is None:
+        # The connection comes first when with_db_connection is applied
+        query = next((arg for arg in args if isinstance(arg, str)), None)
+    return query
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class _QueryStats:
+    __slots__ = ('count', 'errors', 'total', 'max', 'durations')
+
+    def __init__(self, samples):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.durations = deque(maxlen=samples)
+
+
+class QueryProfiler:
+    """Records the queries run by @profiled functions
+
+    Every profiled call stores a QueryRecord in a ring buffer holding the
+    last `capacity` calls, and its duration in per-normalized-query stats,
+    whose percentiles are computed over the last `samples` durations.
+    Calls slower than slow_threshold seconds are logged as warnings on the
+    'query_profiler' logger. sample_rate profiles that fraction of calls
+    at random (the counts in summary() are then of sampled calls only).
+
+    When enabled is False a profiled call costs one attribute check.
+    """
+
+    def __init__(self, capacity=1000, slow_threshold=0.1, sample_rate=1.0, samples=1024,
+                 enabled=True):
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate must be in (0, 1]")
+        self.slow_threshold = slow_threshold
+        self.sample_rate = sample_rate
+        self.samples = samples
+        self.enabled = enabled
+        self._records = deque(maxlen=capacity)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def record(self, query, duration, rows=None, function=None, caller=None, error=None,
+               started_at=None):
+        """Add one call; profiled() calls this, but it can be used directly"""
+        normalized = normalize_query(query) if query is not None else None
+        entry = QueryRecord(query, normalized,
+                            started_at if started_at is not None else time.time() - duration,
+                            duration, rows, function, caller, error)
+        with self._lock:
+            self._records.append(entry)
+            stats = self._stats.get(normalized)
+            if stats is None:
+                stats = self._stats[normalized] = _QueryStats(self.samples)
+            stats.count += 1
+            stats.total += duration
+            stats.max = max(stats.max, duration)
+            stats.durations.append(duration)
+            if error is not None:
+                stats.errors += 1
+        if self.slow_threshold is not None and duration >= self.slow_threshold:
+            logger.warning("Slow query (%.1f ms, %s rows) in %s called from %s: %s",
+                           duration * 1000, rows, function, caller, query)
+        return entry
+
+    def recent(self, limit=None):
+        """The most recent QueryRecords, oldest first"""
+        with self._lock:
+            records = list(self._records)
+        return records if limit is None else records[-limit:]
+
+    def summary(self):
+        """Per normalized query: count, errors, total/mean/max and p50/p95/p99
+        durations in seconds, slowest total first"""
+        with self._lock:
+            snapshot = [(query, stats.count, stats.errors, stats.total, stats.max,
+                         sorted(stats.durations))
+                        for query, stats in self._stats.items()]
+        summary = {}
+        for query, count, errors, total, longest, ordered in sorted(
+                snapshot, key=lambda item: item[3], reverse=True):
+            summary[query] = {
+                'count': count,
+                'errors': errors,
+                'total': total,
+                'mean': total / count,
+                'max': longest,
+                'p50': percentile(ordered, 0.50),
+                'p95': percentile(ordered, 0.95),
+                'p99': percentile(ordered, 0.99),
+            }
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self._records.clear()
+            self._stats.clear()
+
+
+# Used by profiled (and log_queries) unless another profiler is given
+default_profiler = QueryProfiler()
+
+
+def profiled(func=None, *, profiler=None):
+    """Profile the query a function runs
+
+    The query is taken from the `query` keyword or the first str argument.
+    Records the wall time, the rows returned (from a fetchall() list or a
+    fetchone() row), the decorated function and the code that called it,
+    and any exception, which is re-raised.
+    """
+    if func is None:
+        return lambda f: profiled(f, profiler=profiler)
+    function = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        active = profiler if profiler is not None else default_profiler
+        if not active.enabled or (active.sample_rate < 1
+                                  and random.random() >= active.sample_rate):
+            return func(*args, **kwargs)
+        frame = sys._getframe(1)
+        # Skip the other decorators stacked on func (with_db_connection, ...)
+        while frame.f_back is not None and frame.f_code.co_name == 'wrapper':
+            frame = frame.f_back
+        caller = f"{frame.f_code.co_name} ({frame.f_code.co_filename}:{frame.f_lineno})"
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            active.record(_find_query(args, kwargs), time.perf_counter() - start, None,
+                          function, caller, repr(e), started_at)
+            raise
+        active.record(_find_query(args, kwargs), time.perf_counter() - start,
+                      count_rows(result), function, caller, None, started_at)
+        return result
+    return wrapper
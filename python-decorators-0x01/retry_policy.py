@@ -0,0 +1,147 @@
+import asyncio
+import functools
+import inspect
+import random
+import sqlite3
+import threading
+import time
+
+# OperationalError messages worth retrying: another connection holds a lock
+TRANSIENT_MESSAGES = ('database is locked', 'database table is locked', 'busy')
+
+
+def is_transient(error):
+    """True for errors a retry can fix, e.g. sqlite3.OperationalError
+    'database is locked'; syntax errors, ProgrammingError, IntegrityError
+    and other bugs or bad data are not retried"""
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error).lower()
+        return any(text in message for text in TRANSIENT_MESSAGES)
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+class RetryBudget:
+    """Token bucket shared by every policy using it
+
+    Each retry takes a token; tokens come back at refill_rate per second up
+    to capacity. When the database is down this caps the retries the whole
+    process makes, instead of every caller multiplying the load.
+    """
+
+    def __init__(self, capacity=20, refill_rate=2.0):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.denied = 0
+
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity,
+                               self._tokens + (now - self._updated) * self.refill_rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self.denied += 1
+            return False
+
+    @property
+    def tokens(self):
+        with self._lock:
+            elapsed = time.monotonic() - self._updated
+            return min(self.capacity, self._tokens + elapsed * self.refill_rate)
+
+
+# Process-wide budget used by policies that don't get their own
+default_budget = RetryBudget()
+
+
+class RetryPolicy:
+    """When and how long to wait before retrying a failed call
+
+    A call is tried at most `attempts` times. Only errors for which
+    retryable(error) is true are retried. Waits grow as base_delay *
+    multiplier**n capped at max_delay; jitter=True picks a random wait
+    between 0 and that ("full jitter") so workers blocked by the same lock
+    don't retry in lockstep. No retry is made that would sleep past
+    `deadline` seconds after the first attempt, or when the retry budget
+    is empty; the last error is then raised.
+
+    Use policy.call(func, ...) / await policy.call_async(func, ...), or the
+    policy as a decorator of plain or async functions. The async variant
+    waits with asyncio.sleep, so it never blocks the event loop.
+    """
+
+    def __init__(self, attempts=3, base_delay=0.1, max_delay=5.0, multiplier=2.0,
+                 jitter=True, deadline=None, retryable=is_transient, budget=default_budget):
+        if attempts < 1:
+            raise ValueError("attempts must be at least 1")
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+        self.retryable = retryable
+        self.budget = budget
+
+    def backoff(self, retry):
+        """Wait before the given retry (0 for the first)"""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** retry)
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def next_delay(self, error, attempt, started):
+        """Seconds to wait before another attempt, or None to give up
+
+        attempt is the number of attempts made so far and started the
+        time.monotonic() of the first one.
+        """
+        if attempt >= self.attempts or not self.retryable(error):
+            return None
+        delay = self.backoff(attempt - 1)
+        if self.deadline is not None and time.monotonic() + delay - started > self.deadline:
+            return None
+        if self.budget is not None and not self.budget.try_acquire():
+            return None
+        return delay
+
+    def call(self, func, *args, **kwargs):
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self.next_delay(e, attempt, started)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+
+    async def call_async(self, func, *args, **kwargs):
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = self.next_delay(e, attempt, started)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    def __call__(self, func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await self.call_async(func, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+        return wrapper
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Unit tests for the SQLite connection pool behind with_db_connection"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+from connection_pool import POOL_MODES, SQLitePool
+
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+transactional = __import__('2-transactional').transactional
+
+
+class TestNestedCalls(unittest.TestCase):
+    """Test that nested decorated calls never drop their caller's writes"""
+
+    def setUp(self):
+        """Create a file database with one user"""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'users.db')
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO users (name) VALUES ('first')")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        """Remove the database"""
+        shutil.rmtree(self.directory)
+
+    def count_users(self):
+        """Users committed to the database, read over a separate connection"""
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_inner_call_keeps_outer_transaction(self):
+        """Test an inner call's release doesn't roll back the outer insert"""
+        for mode in POOL_MODES:
+            with self.subTest(mode=mode):
+                pool = SQLitePool(self.path, max_size=2, mode=mode, timeout=1)
+                self.addCleanup(pool.close)
+
+                @with_db_connection(pool=pool)
+                def read_name(conn):
+                    return conn.execute("SELECT name FROM users WHERE id = 1").fetchone()
+
+                @with_db_connection(pool=pool)
+                @transactional
+                def add_user(conn, name):
+                    conn.execute("INSERT INTO users (name) VALUES (?)", (name,))
+                    read_name()
+
+                before = self.count_users()
+                add_user('second')
+                self.assertEqual(self.count_users(), before + 1)
+
+    def test_outermost_release_resets(self):
+        """Test the connection is reset once the outermost call returns it"""
+        pool = SQLitePool(self.path, mode='thread')
+        self.addCleanup(pool.close)
+
+        outer = pool.acquire()
+        outer.execute("INSERT INTO users (name) VALUES ('pending')")
+        inner = pool.acquire()
+        self.assertIs(inner, outer)
+        pool.release(inner)
+        self.assertTrue(outer.in_transaction)
+
+        pool.release(outer)
+        self.assertFalse(outer.in_transaction)
+        self.assertEqual(self.count_users(), 1)
+
+
+class TestThreadMode(unittest.TestCase):
+    """Test thread mode's bound on open connections"""
+
+    def test_exited_threads_free_their_connections(self):
+        """Test more threads than max_size run, one after another"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        pool = SQLitePool(os.path.join(directory, 'users.db'), max_size=2,
+                          mode='thread', timeout=5)
+        self.addCleanup(pool.close)
+
+        def work():
+            with pool.connection() as conn:
+                conn.execute("SELECT 1")
+
+        for _ in range(10):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        work()
+        self.assertLessEqual(pool.stats()['open'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
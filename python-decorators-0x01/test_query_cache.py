@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Unit tests for table-aware invalidation of cached query results"""
+
+import sqlite3
+import unittest
+from unittest.mock import patch
+from query_cache import QueryCache, make_key
+
+cache_query = __import__('4-cache_query').cache_query
+transactional = __import__('2-transactional').transactional
+
+USERS_QUERY = "SELECT * FROM users"
+ORDERS_QUERY = "SELECT * FROM orders"
+
+
+class TestTransactionalInvalidation(unittest.TestCase):
+    """Test that commits drop only the cached reads they made stale"""
+
+    def setUp(self):
+        """Create an in-memory database and a cached reader for it"""
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.executescript("""
+            CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT);
+            CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER);
+            INSERT INTO users VALUES (1, 'a@example.com');
+            INSERT INTO orders VALUES (1, 1);
+        """)
+        self.conn.commit()
+        self.cache = QueryCache()
+        printing = patch('builtins.print')
+        printing.start()
+        self.addCleanup(printing.stop)
+
+        @cache_query(cache=self.cache)
+        def fetch(conn, query, params=()):
+            return conn.execute(query, params).fetchall()
+        self.fetch = fetch
+
+    def tearDown(self):
+        """Close the database"""
+        self.conn.close()
+
+    def update_email(self, email, fail=False):
+        """Update user 1's email in a transaction, optionally failing"""
+        @transactional(cache=self.cache)
+        def update(conn):
+            conn.execute("UPDATE users SET email = ? WHERE id = 1", (email,))
+            if fail:
+                raise RuntimeError("fail after the write")
+        update(self.conn)
+
+    def test_commit_invalidates_only_written_tables(self):
+        """Test a committed write drops the reads of its table only"""
+        self.fetch(self.conn, USERS_QUERY)
+        self.fetch(self.conn, ORDERS_QUERY)
+
+        self.update_email('b@example.com')
+
+        self.assertNotIn(make_key(USERS_QUERY), self.cache)
+        self.assertIn(make_key(ORDERS_QUERY), self.cache)
+        self.assertEqual(self.fetch(self.conn, USERS_QUERY),
+                         [(1, 'b@example.com')])
+
+    def test_rollback_invalidates_nothing(self):
+        """Test a rolled back write leaves every cached read in place"""
+        self.fetch(self.conn, USERS_QUERY)
+        self.fetch(self.conn, ORDERS_QUERY)
+
+        with self.assertRaises(RuntimeError):
+            self.update_email('b@example.com', fail=True)
+
+        self.assertIn(make_key(USERS_QUERY), self.cache)
+        self.assertIn(make_key(ORDERS_QUERY), self.cache)
+        self.assertEqual(self.cache.stats()['invalidations'], 0)
+        self.assertEqual(self.fetch(self.conn, USERS_QUERY),
+                         [(1, 'a@example.com')])
+
+    def test_unknown_write_invalidates_everything(self):
+        """Test a write whose tables can't be parsed clears the cache"""
+        self.fetch(self.conn, USERS_QUERY)
+        self.fetch(self.conn, ORDERS_QUERY)
+
+        @transactional(cache=self.cache)
+        def write(conn):
+            conn.execute("WITH ids AS (SELECT 2) "
+                         "INSERT INTO orders (id, user_id) SELECT 2, 1")
+        write(self.conn)
+
+        self.assertEqual(len(self.cache), 0)
+
+
+class TestSnapshotToken(unittest.TestCase):
+    """Test that a read overlapping a write is not cached"""
+
+    def test_stale_token_is_rejected(self):
+        """Test set() refuses a result read before its table was written"""
+        cache = QueryCache()
+        key = make_key(USERS_QUERY)
+        token = cache.snapshot({'users'})
+
+        cache.invalidate_tables({'users'})
+
+        self.assertFalse(cache.set(key, ['old'], tables={'users'}, token=token))
+        self.assertNotIn(key, cache)
+
+    def test_token_of_other_table_stays_valid(self):
+        """Test a write to another table doesn't reject the result"""
+        cache = QueryCache()
+        key = make_key(ORDERS_QUERY)
+        token = cache.snapshot({'orders'})
+
+        cache.invalidate_tables({'users'})
+
+        self.assertTrue(cache.set(key, ['row'], tables={'orders'}, token=token))
+        self.assertIn(key, cache)
+
+    def test_write_during_cached_read_is_not_stored(self):
+        """Test cache_query drops a result whose table changed mid-read"""
+        cache = QueryCache()
+
+        @cache_query(cache=cache)
+        def fetch(conn, query, params=()):
+            # Another thread commits a write while this query runs
+            cache.invalidate_tables({'users'})
+            return ['stale']
+
+        with patch('builtins.print'):
+            fetch(None, USERS_QUERY)
+        self.assertNotIn(make_key(USERS_QUERY), cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Unit tests for retrying transient database errors"""
+
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from retry_policy import RetryBudget, RetryPolicy, is_transient
+
+retry_on_failure = __import__('3-retry_on_failure').retry_on_failure
+
+
+class Flaky:
+    """Callable raising error for its first `failures` calls"""
+
+    def __init__(self, failures, error=None):
+        self.failures = failures
+        self.error = error or sqlite3.OperationalError("database is locked")
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return 'ok'
+
+
+class TestIsTransient(unittest.TestCase):
+    """Test which errors are classified as worth retrying"""
+
+    def test_classification(self):
+        """Test locked/busy and connection errors are transient, bugs are not"""
+        cases = [
+            (sqlite3.OperationalError("database is locked"), True),
+            (sqlite3.OperationalError("database table is locked"), True),
+            (sqlite3.OperationalError('near "SELEC": syntax error'), False),
+            (sqlite3.OperationalError("no such table: users"), False),
+            (sqlite3.ProgrammingError("Cannot operate on a closed database."), False),
+            (sqlite3.IntegrityError("UNIQUE constraint failed: users.email"), False),
+            (TimeoutError(), True),
+            (ConnectionResetError(), True),
+            (ValueError(), False),
+        ]
+        for error, expected in cases:
+            with self.subTest(error=error):
+                self.assertEqual(is_transient(error), expected)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Test RetryPolicy against real and simulated SQLite errors"""
+
+    def setUp(self):
+        """Create a file database, since locks need two connections"""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'users.db')
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        """Remove the database"""
+        shutil.rmtree(self.directory)
+
+    def test_syntax_error_is_not_retried(self):
+        """Test a query with a syntax error is tried exactly once"""
+        calls = []
+        conn = sqlite3.connect(self.path)
+        self.addCleanup(conn.close)
+
+        @RetryPolicy(attempts=5, base_delay=0, budget=None)
+        def broken_query():
+            calls.append(1)
+            return conn.execute("SELEC * FROM users").fetchall()
+
+        with self.assertRaises(sqlite3.OperationalError):
+            broken_query()
+        self.assertEqual(len(calls), 1)
+
+    def test_locked_database_is_retried_until_released(self):
+        """Test a write blocked by another connection's lock succeeds later"""
+        holder = sqlite3.connect(self.path, check_same_thread=False)
+        self.addCleanup(holder.close)
+        holder.execute("BEGIN IMMEDIATE")
+        holder.execute("INSERT INTO users (name) VALUES ('holder')")
+        threading.Timer(0.05, holder.commit).start()
+
+        conn = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(conn.close)
+        calls = []
+
+        @RetryPolicy(attempts=50, base_delay=0.01, max_delay=0.02, jitter=False,
+                     budget=None)
+        def insert():
+            calls.append(1)
+            conn.execute("INSERT INTO users (name) VALUES ('writer')")
+            conn.commit()
+
+        insert()
+        self.assertGreater(len(calls), 1)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM users").fetchone()[0], 2)
+
+    def test_gives_up_after_attempts(self):
+        """Test the last error is raised once attempts are used up"""
+        flaky = Flaky(failures=10)
+        with self.assertRaises(sqlite3.OperationalError):
+            RetryPolicy(attempts=3, base_delay=0, budget=None).call(flaky)
+        self.assertEqual(flaky.calls, 3)
+
+    def test_budget_limits_retries(self):
+        """Test an empty budget stops retrying and counts the denial"""
+        budget = RetryBudget(capacity=2, refill_rate=0)
+        policy = RetryPolicy(attempts=10, base_delay=0, budget=budget)
+
+        first = Flaky(failures=10)
+        with self.assertRaises(sqlite3.OperationalError):
+            policy.call(first)
+        # one attempt plus the two retries the budget paid for
+        self.assertEqual(first.calls, 3)
+        self.assertEqual(budget.denied, 1)
+
+        # The budget is shared: the next caller gets no retries at all
+        second = Flaky(failures=1)
+        with self.assertRaises(sqlite3.OperationalError):
+            policy.call(second)
+        self.assertEqual(second.calls, 1)
+        self.assertEqual(budget.denied, 2)
+
+    def test_budget_refills(self):
+        """Test tokens come back at refill_rate up to capacity"""
+        budget = RetryBudget(capacity=1, refill_rate=100)
+        self.assertTrue(budget.try_acquire())
+        time.sleep(0.05)
+        self.assertTrue(budget.try_acquire())
+        self.assertLessEqual(budget.tokens, 1)
+
+    def test_deadline_stops_retries(self):
+        """Test no retry is made that would wait past the deadline"""
+        flaky = Flaky(failures=10)
+        policy = RetryPolicy(attempts=10, base_delay=0.05, jitter=False, deadline=0.12,
+                             budget=None)
+        started = time.monotonic()
+        with self.assertRaises(sqlite3.OperationalError):
+            policy.call(flaky)
+        self.assertLess(time.monotonic() - started, 0.12)
+        # waits of 0.05 then 0.1: the second would end past the deadline
+        self.assertEqual(flaky.calls, 2)
+
+    def test_backoff_grows_and_is_capped(self):
+        """Test waits grow by multiplier and stop at max_delay"""
+        policy = RetryPolicy(base_delay=1, multiplier=2, max_delay=5, jitter=False)
+        self.assertEqual([policy.backoff(n) for n in range(5)], [1, 2, 4, 5, 5])
+        jittered = RetryPolicy(base_delay=1, max_delay=5)
+        self.assertTrue(all(0 <= jittered.backoff(3) <= 5 for _ in range(100)))
+
+
+class TestAsyncRetry(unittest.TestCase):
+    """Test the policy decorating async functions"""
+
+    def test_async_retry_does_not_block_the_loop(self):
+        """Test other tasks run while an async call waits to retry"""
+        flaky = Flaky(failures=2)
+        ticks = []
+
+        @RetryPolicy(attempts=3, base_delay=0.02, jitter=False, budget=None)
+        async def fetch():
+            return flaky()
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        async def main():
+            result, _ = await asyncio.gather(fetch(), ticker())
+            return result
+
+        self.assertEqual(asyncio.run(main()), 'ok')
+        self.assertEqual(flaky.calls, 3)
+        self.assertEqual(len(ticks), 5)
+
+    def test_async_syntax_error_is_not_retried(self):
+        """Test async calls raise non-transient errors at once"""
+        flaky = Flaky(failures=5, error=sqlite3.OperationalError("syntax error"))
+
+        @RetryPolicy(attempts=5, base_delay=0, budget=None)
+        async def fetch():
+            return flaky()
+
+        with self.assertRaises(sqlite3.OperationalError):
+            asyncio.run(fetch())
+        self.assertEqual(flaky.calls, 1)
+
+
+class TestRetryOnFailure(unittest.TestCase):
+    """Test the retry_on_failure decorator keeps its signature"""
+
+    def test_retries_and_delay(self):
+        """Test retries is the total number of attempts"""
+        flaky = Flaky(failures=2)
+        decorated = retry_on_failure(retries=3, delay=0)(flaky)
+        self.assertEqual(decorated(), 'ok')
+        self.assertEqual(flaky.calls, 3)
+
+    def test_custom_policy(self):
+        """Test an explicit policy is used as is"""
+        policy = RetryPolicy(attempts=1)
+        self.assertIs(retry_on_failure(policy=policy), policy)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,41 +1,59 @@
-import mysql.connector
 from mysql.connector import Error
+from connection_pool import get_pool
+from row_decoder import RowDecoder
 
-def stream_users():
-    """Generator function that streams users from the database one by one"""
+def stream_users(unbuffered=False, fetch_size=1000, records=False, buffered=False):
+    """Generator function that streams users from the database one by one
+
+    By default the driver's default cursor is used and read one row at a
+    time with fetchone(), as before. With unbuffered=True the cursor is
+    explicitly unbuffered (even if the connection was configured buffered)
+    and rows are pulled off the socket fetch_size at a time, which caps
+    client memory at roughly one fetch regardless of the table size.
+    buffered=True instead reads the whole result into client memory when
+    the query runs, the baseline the unbuffered mode is measured against.
+
+    records=True yields compact UserRecord tuples (which still support
+    user['age']) instead of dicts.
+    """
+    if unbuffered and buffered:
+        raise ValueError("unbuffered and buffered are mutually exclusive")
+    pool = get_pool()
+    exhausted = False
     try:
-        # Establish database connection
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',  # Replace with your MySQL username
-            password='',  # Replace with your MySQL password
-            database='ALX_prodev'
-        )
-        
-        cursor = connection.cursor(dictionary=True)
-        
+        # Check a connection out of the shared pool
+        connection = pool.acquire()
+
+        if unbuffered or buffered:
+            cursor = connection.cursor(buffered=buffered)
+        else:
+            cursor = connection.cursor()
+
         # Execute query and stream results
         cursor.execute("SELECT * FROM user_data")
-        
+        # Resolve column positions and the UUID conversion once per query
+        decode = RowDecoder.from_cursor(cursor).decoder(records)
+
         while True:
-            row = cursor.fetchone()
-            if row is None:
+            # Unbuffered cursors read straight from the socket, so fetch in
+            # bounded chunks rather than one round of parsing per row
+            rows = cursor.fetchmany(fetch_size) if unbuffered else [cursor.fetchone()]
+            if not rows or rows[0] is None:
+                exhausted = True
                 break
-            # Convert binary UUID to string if needed
-            if 'user_id' in row and isinstance(row['user_id'], bytes):
-                row['user_id'] = row['user_id'].hex()
-            yield row
-            
+            for row in rows:
+                yield decode(row)
+
     except Error as e:
         print(f"Database error: {e}")
         yield None
     finally:
-        if 'connection' in locals() and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if 'connection' in locals():
+            # A stream abandoned early drops its connection (see release_stream)
+            pool.release_stream(connection, locals().get('cursor'), exhausted)
 
 # Example usage:
 if __name__ == "__main__":
     user_generator = stream_users()
     for user in user_generator:
-        print(user)
\ No newline at end of file
+        print(user)
@@ -1,51 +1,186 @@
-import mysql.connector
 from mysql.connector import Error
+from adaptive import AdaptiveBatchSizer
+from connection_pool import get_pool
+from columnar import COLUMNAR_MODES, require_numpy, to_columns, to_structured
+from filters import Column, Filter
+from partitioned_scan import partitioned_batches
+from pipeline import source
+from prefetch import prefetched
+from row_decoder import RowDecoder
+from sqlite_backend import SQLiteConnection
+from watermark import WATERMARK_COLUMNS, ChangeBatch, changes_query
 
-def stream_users_in_batches(batch_size):
-    """Generator function that streams users in batches from the database"""
+# Users kept by batch_processing
+OVER_25 = Filter(Column('age') > 25)
+
+def stream_users_in_batches(batch_size, columnar=None, user_filter=None, records=False,
+                            prefetch=0, adaptive=None, watermark=None):
+    """Generator function that streams users in batches from the database
+
+    columnar='columns' yields each batch as a dict of per-column NumPy
+    arrays and columnar='structured' as one NumPy structured array, instead
+    of a list of dicts. user_id is then left as 16 raw bytes per row (a
+    NumPy void field; bytes(value) gives the key).
+
+    user_filter (a filters.Filter) is compiled into the query's WHERE
+    clause and column list, so rows it rejects never leave the database.
+
+    records=True fills list batches with compact UserRecord tuples instead
+    of dicts.
+
+    prefetch=N fetches up to N batches ahead on a background thread, so the
+    database works on the next batch while the caller processes this one.
+
+    adaptive=True (or an AdaptiveBatchSizer, whose batch_size can then be
+    monitored) starts at batch_size and retunes every fetch toward the
+    sizer's latency and memory targets.
+
+    watermark (a watermark.WatermarkStore) makes the stream incremental:
+    only users changed after the store's committed watermark are read, in
+    (updated_at, user_id) order, and each batch is a ChangeBatch whose
+    ack() commits its last row as the new watermark. Unacknowledged
+    batches are streamed again next time. Changes are only streamed once
+    they are the store's settle seconds old, so rows committed late by
+    long transactions aren't skipped.
+    """
+    if prefetch:
+        yield from prefetched(stream_users_in_batches(batch_size, columnar, user_filter,
+                                                      records, adaptive=adaptive,
+                                                      watermark=watermark), prefetch)
+        return
+    if adaptive is True:
+        adaptive = AdaptiveBatchSizer.starting_at(batch_size)
+    if adaptive:
+        fetch = lambda: adaptive.measure(cursor.fetchmany)
+    else:
+        fetch = lambda: cursor.fetchmany(batch_size)
+
+    if columnar is not None:
+        if columnar not in COLUMNAR_MODES:
+            raise ValueError(f"columnar must be one of {COLUMNAR_MODES}")
+        if watermark is not None:
+            raise ValueError("columnar batches are not supported with watermark")
+        require_numpy()
+    pool = get_pool()
+    exhausted = False
     try:
-        # Establish database connection
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',  # Replace with your MySQL username
-            password='',  # Replace with your MySQL password
-            database='ALX_prodev'
-        )
+        # Check a connection out of the shared pool
+        connection = pool.acquire()
         
-        cursor = connection.cursor(dictionary=True)
+        cursor = connection.cursor()
         
         # Execute query and stream results in batches
-        cursor.execute("SELECT * FROM user_data")
+        if watermark is not None:
+            since = watermark.get()
+            query, params = changes_query(
+                'user_data', since,
+                user_filter.predicate if user_filter is not None else None,
+                user_filter.columns if user_filter is not None else None,
+                watermark.settle,
+                'sqlite' if isinstance(connection, SQLiteConnection) else 'mysql')
+            cursor.execute(query, params)
+            decode = RowDecoder.from_cursor(cursor).decoder(records)
+            names = [column[0] for column in cursor.description]
+            positions = [names.index(name) for name in WATERMARK_COLUMNS]
+            while True:
+                rows = fetch()
+                if not rows:
+                    exhausted = True
+                    break
+                last = tuple(rows[-1][position] for position in positions)
+                yield ChangeBatch([decode(row) for row in rows], watermark, since, last)
+                since = last
+            return
+        if user_filter is None:
+            cursor.execute("SELECT * FROM user_data")
+        else:
+            query, params = user_filter.select('user_data')
+            cursor.execute(query, params)
+
+        if columnar is not None:
+            # Plain tuples go straight into arrays; each batch's dtype is the
+            # previous one widened to fit it, so columns never get narrower
+            names = [column[0] for column in cursor.description]
+            dtype = None
+            while True:
+                rows = fetch()
+                if not rows:
+                    exhausted = True
+                    break
+                array = to_structured(names, rows, dtype)
+                dtype = array.dtype
+                yield array if columnar == 'structured' else to_columns(array)
+            return
         
+        # Resolve column positions and the UUID conversion once per query
+        decode = RowDecoder.from_cursor(cursor).decoder(records)
         while True:
-            batch = cursor.fetchmany(batch_size)
-            if not batch:
+            rows = fetch()
+            if not rows:
+                exhausted = True
                 break
-            # Convert binary UUID to string for each user in batch
-            for user in batch:
-                if 'user_id' in user and isinstance(user['user_id'], bytes):
-                    user['user_id'] = user['user_id'].hex()
-            yield batch
+            yield [decode(row) for row in rows]
             
     except Error as e:
         print(f"Database error: {e}")
         yield None
     finally:
-        if 'connection' in locals() and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if 'connection' in locals():
+            pool.release_stream(connection, locals().get('cursor'), exhausted)
 
-def batch_processing(batch_size):
-    """Process batches to filter users over age 25"""
-    batch_generator = stream_users_in_batches(batch_size)
-    
-    for batch in batch_generator:
-        if batch is None:
-            continue
-            
-        # Filter users over 25 in the current batch
-        filtered_users = [user for user in batch if user['age'] > 25]
-        yield filtered_users
+def _present(batch):
+    return batch is not None
+
+def batch_processing(batch_size, columnar=None, pushdown=True, partitions=None,
+                     prefetch=0, watermark=None, executor='inline', workers=None):
+    """Process batches to filter users over age 25
+
+    By default the age filter is pushed down into the SQL query. With
+    pushdown=False every user is fetched and the same filter runs in Python,
+    vectorized when a columnar mode is used. partitions=N scans N user_id
+    ranges in parallel worker processes (see partitioned_scan). prefetch is
+    passed on to stream_users_in_batches.
+
+    watermark only processes users changed since the last acknowledged
+    batch (see stream_users_in_batches); call ack() on each yielded batch
+    once it has been handled.
+
+    The batches flow through a pipeline; with pushdown=False, executor=
+    'thread' or 'process' runs the Python filter stage on workers (see
+    pipeline.py) while the next batches are still being fetched.
+    """
+    if partitions is not None and columnar is not None:
+        raise ValueError("columnar batches are not supported with partitions")
+    if partitions is not None and watermark is not None:
+        raise ValueError("watermark is not supported with partitions")
+
+    if pushdown:
+        if partitions is not None:
+            batch_generator = partitioned_batches(partitions, batch_size,
+                                                  user_filter=OVER_25)
+        else:
+            batch_generator = stream_users_in_batches(batch_size, columnar=columnar,
+                                                      user_filter=OVER_25,
+                                                      prefetch=prefetch,
+                                                      watermark=watermark)
+        yield from source(batch_generator).filter(_present)
+        return
+
+    if partitions is not None:
+        batch_generator = partitioned_batches(partitions, batch_size)
+    else:
+        batch_generator = stream_users_in_batches(batch_size, columnar=columnar,
+                                                  prefetch=prefetch, watermark=watermark)
+
+    batches = source(batch_generator).filter(_present)
+    if watermark is not None:
+        # Keep the filtered batches acknowledgeable; their store stays in
+        # this process, so the stage runs inline
+        yield from batches.map(lambda batch: batch.derive(OVER_25.apply(batch)))
+        return
+
+    # Filter users over 25 in each batch
+    yield from batches.map(OVER_25.apply, executor=executor, workers=workers)
 
 # Example usage:
 if __name__ == "__main__":
@@ -58,6 +193,4 @@ if __name__ == "__main__":
         
         # Second loop: process users in current batch
         for user in users_over_25:
-            print(f"ID: {user['user_id']}, Name: {user['name']}, Age: {user['age']}")
-            
-        return user
\ No newline at end of file
+            print(f"ID: {user['user_id']}, Name: {user['name']}, Age: {user['age']}")
\ No newline at end of file
@@ -1,52 +1,90 @@
-import mysql.connector
 from mysql.connector import Error
+from adaptive import AdaptiveBatchSizer
+from connection_pool import get_pool
+# Token helpers live in resume_token, which needs no database driver
+from resume_token import decode_resume_token, encode_resume_token, page_token
+from row_decoder import RowDecoder
+
+# Keyset pages walk the primary key (see query_plans.py)
+FIRST_PAGE_QUERY = "SELECT * FROM user_data ORDER BY user_id LIMIT %s"
+PAGE_AFTER_QUERY = "SELECT * FROM user_data WHERE user_id > %s ORDER BY user_id LIMIT %s"
 
 def paginate_users(page_size, offset):
     """Fetch a specific page of users from the database"""
+    pool = get_pool()
     try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',  # Replace with your MySQL username
-            password='',  # Replace with your MySQL password
-            database='ALX_prodev'
-        )
-        
-        cursor = connection.cursor(dictionary=True)
+        connection = pool.acquire()
+
+        cursor = connection.cursor()
         query = "SELECT * FROM user_data LIMIT %s OFFSET %s"
         cursor.execute(query, (page_size, offset))
-        
-        page = cursor.fetchall()
-        # Convert binary UUID to string for each user
-        for user in page:
-            if 'user_id' in user and isinstance(user['user_id'], bytes):
-                user['user_id'] = user['user_id'].hex()
-        
-        return page
+
+        # Convert rows to dicts with hex user_ids
+        return RowDecoder.from_cursor(cursor).decode_many(cursor.fetchall())
+    except Error as e:
+        print(f"Database error: {e}")
+        return []
+    finally:
+        if 'connection' in locals():
+            pool.release_stream(connection, locals().get('cursor'))
+
+def paginate_users_after(page_size, last_user_id=None):
+    """Fetch the page of users whose user_id follows last_user_id
+
+    This is keyset ("seek") pagination: the primary key index jumps straight
+    to last_user_id, so every page costs the same no matter how deep it is,
+    unlike OFFSET which has to scan and discard all the preceding rows.
+    """
+    pool = get_pool()
+    try:
+        connection = pool.acquire()
+
+        cursor = connection.cursor()
+        if last_user_id is None:
+            cursor.execute(FIRST_PAGE_QUERY, (page_size,))
+        else:
+            cursor.execute(PAGE_AFTER_QUERY, (last_user_id, page_size))
+
+        # Convert rows to dicts with hex user_ids
+        return RowDecoder.from_cursor(cursor).decode_many(cursor.fetchall())
     except Error as e:
         print(f"Database error: {e}")
         return []
     finally:
-        if 'connection' in locals() and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if 'connection' in locals():
+            pool.release_stream(connection, locals().get('cursor'))
+
+def lazy_paginate(page_size, resume_token=None, adaptive=None):
+    """Generator that lazily loads paginated user data
 
-def lazy_paginate(page_size):
-    """Generator that lazily loads paginated user data"""
-    offset = 0
+    Pages are walked in user_id order with keyset pagination. Pass the token
+    returned by page_token() for the last processed page as resume_token to
+    continue a previous walk from where it stopped.
+
+    adaptive=True (or an AdaptiveBatchSizer to monitor) starts at page_size
+    and resizes each page from the measured fetch time and row width.
+    """
+    if adaptive is True:
+        adaptive = AdaptiveBatchSizer.starting_at(page_size)
+    last_user_id = decode_resume_token(resume_token) if resume_token else None
     while True:
-        page = paginate_users(page_size, offset)
+        if adaptive:
+            page = adaptive.measure(lambda size: paginate_users_after(size, last_user_id))
+        else:
+            page = paginate_users_after(page_size, last_user_id)
         if not page:  # No more users to fetch
             break
         yield page
-        offset += page_size
+        last_user_id = bytes.fromhex(page[-1]['user_id'])
 
 # Example usage:
 if __name__ == "__main__":
     # Create generator for pages of 5 users
     user_pages = lazy_paginate(5)
-    
+
     # Single loop to process pages as needed
     for page_num, page in enumerate(user_pages, 1):
         print(f"\nPage {page_num}:")
         for user in page:
-            print(f"ID: {user['user_id']}, Name: {user['name']}, Age: {user['age']}")
\ No newline at end of file
+            print(f"ID: {user['user_id']}, Name: {user['name']}, Age: {user['age']}")
+        print(f"Resume token: {page_token(page)}")
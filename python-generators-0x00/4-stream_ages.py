@@ -1,22 +1,28 @@
-import mysql.connector
 from mysql.connector import Error
+from age_summary import describe, read_summary, verify_summary
+from connection_pool import get_pool
+from partitioned_scan import partitioned_stats
+from pipeline import source
+from snapshot import snapshot_ages, snapshot_average_age
+from stats import StreamingStats, sql_summary, stats_of
+
+# Served from age_index alone (see query_plans.py)
+AGES_QUERY = "SELECT age FROM user_data"
 
 def stream_user_ages():
     """Generator that streams user ages one by one from the database"""
+    pool = get_pool()
+    exhausted = False
     try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',  # Replace with your MySQL username
-            password='',  # Replace with your MySQL password
-            database='ALX_prodev'
-        )
+        connection = pool.acquire()
         
         cursor = connection.cursor()
-        cursor.execute("SELECT age FROM user_data")
+        cursor.execute(AGES_QUERY)
         
         while True:
             row = cursor.fetchone()
             if row is None:
+                exhausted = True
                 break
             yield row[0]  # Yield just the age value
             
@@ -24,18 +30,97 @@ def stream_user_ages():
         print(f"Database error: {e}")
         yield None
     finally:
-        if 'connection' in locals() and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if 'connection' in locals():
+            pool.release_stream(connection, locals().get('cursor'), exhausted)
+
+def age_statistics(pushdown=False, partitions=None, snapshot=None,
+                   executor='inline', workers=None, batch_size=10000):
+    """Count, mean, variance, min/max and percentiles of user ages
+
+    The streaming path makes one pass over stream_user_ages() with bounded
+    memory; partitions=N splits that pass across N worker processes and
+    merges their partial results. pushdown=True asks the database for the
+    exact aggregates instead; percentiles are not available on that path.
+    snapshot=PATH reads the ages from an exported snapshot file instead.
+
+    The streaming paths run as a pipeline: ages are grouped into batches
+    of batch_size, each batch is summarized by a stage that
+    executor='thread' or 'process' spreads over workers, and the partial
+    results are merged.
+    """
+    if snapshot is None and partitions is not None and not pushdown:
+        return partitioned_stats(partitions, column='age').summary()
+    if snapshot is not None or not pushdown:
+        ages = snapshot_ages(snapshot) if snapshot is not None else stream_user_ages()
+        merged = StreamingStats()
+        (source(ages)
+         .filter(lambda age: age is not None)
+         .batch(batch_size)
+         .map(stats_of, executor=executor, workers=workers)
+         .sink(merged.merge))
+        return merged.summary()
+
+    pool = get_pool()
+    try:
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                return sql_summary(cursor, 'age', 'user_data')
+            finally:
+                cursor.close()
+    except Error as e:
+        print(f"Database error: {e}")
+        return None
+
+def maintained_age_statistics(verify=False):
+    """age_statistics() answered from the maintained summary tables
+
+    Reads one summary row and at most 1000 histogram buckets however many
+    users there are. verify=True also recomputes the summary from
+    user_data, reports any drift and returns the recomputed figures.
+    """
+    pool = get_pool()
+    try:
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                if not verify:
+                    return describe(read_summary(cursor))
+                check = verify_summary(cursor)
+                if not check['ok']:
+                    print(f"Age summary is out of date: maintained {check['maintained']}, "
+                          f"recomputed {check['recomputed']}")
+                return check['recomputed']
+            finally:
+                cursor.close()
+    except Error as e:
+        print(f"Database error: {e}")
+        return None
+
+def calculate_average_age(pushdown=False, snapshot=None, maintained=False):
+    """Calculate average age using the streaming generator
+
+    pushdown=True lets the database compute the average instead;
+    snapshot=PATH sums the age column of an exported snapshot file;
+    maintained=True reads it from the maintained summary in O(1).
+    """
+    if maintained:
+        summary = maintained_age_statistics()
+        return (summary['mean'] or 0) if summary else 0
+    if snapshot is not None:
+        return snapshot_average_age(snapshot)
+    if pushdown:
+        summary = age_statistics(pushdown=True)
+        return (summary['mean'] or 0) if summary else 0
 
-def calculate_average_age():
-    """Calculate average age using the streaming generator"""
     age_generator = stream_user_ages()
     total = 0
     count = 0
     
     # Single loop to process all ages
     for age in age_generator:
+        if age is None:
+            continue
         total += age
         count += 1
     
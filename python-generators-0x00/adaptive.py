@@ -0,0 +1,117 @@
+import sys
+import threading
+import time
+from collections import deque
+
+
+def estimate_row_bytes(row):
+    """Rough in-memory payload size of one dict, tuple or record row"""
+    values = row.values() if isinstance(row, dict) else row
+    size = 0
+    for value in values:
+        if isinstance(value, (str, bytes, bytearray)):
+            size += len(value)
+        else:
+            size += 8
+    return size + sys.getsizeof(row)
+
+
+class AdaptiveBatchSizer:
+    """Chooses the next batch size from how the previous fetches behaved
+
+    Each observation records rows fetched, seconds spent fetching them and
+    (optionally) their size in bytes. The per-row time and width are
+    smoothed with an exponential moving average, and the next batch is the
+    largest size expected to stay within target_latency seconds and within
+    memory_budget bytes. Sizes move by at most max_step per observation so
+    one noisy fetch can't swing the batch size wildly.
+
+    Read batch_size (or stats()) to monitor the value currently in use.
+    """
+
+    def __init__(self, initial=1000, target_latency=0.2, memory_budget=None,
+                 min_size=10, max_size=100000, smoothing=0.3, max_step=2.0,
+                 history=100):
+        if not min_size <= initial <= max_size:
+            raise ValueError("initial must be between min_size and max_size")
+        self.target_latency = target_latency
+        self.memory_budget = memory_budget
+        self.min_size = min_size
+        self.max_size = max_size
+        self.smoothing = smoothing
+        self.max_step = max_step
+        self._size = initial
+        self._seconds_per_row = None
+        self._bytes_per_row = None
+        self._lock = threading.Lock()
+        self.history = deque(maxlen=history)
+
+    @classmethod
+    def starting_at(cls, size, **options):
+        """Sizer starting at a caller's batch or page size
+
+        The default min_size and max_size are widened to include size, so
+        small sizes such as lazy_paginate(5, adaptive=True) work.
+        """
+        options.setdefault('min_size', min(10, size))
+        options.setdefault('max_size', max(100000, size))
+        return cls(initial=size, **options)
+
+    @property
+    def batch_size(self):
+        """The size the next fetch should ask for"""
+        return self._size
+
+    def _smooth(self, previous, value):
+        if previous is None:
+            return value
+        return self.smoothing * value + (1 - self.smoothing) * previous
+
+    def observe(self, rows, seconds, nbytes=None):
+        """Record one fetch and return the size to use for the next one"""
+        if rows <= 0:
+            return self._size
+        with self._lock:
+            self._seconds_per_row = self._smooth(self._seconds_per_row, seconds / rows)
+            if nbytes is not None:
+                self._bytes_per_row = self._smooth(self._bytes_per_row, nbytes / rows)
+
+            limits = [self.max_size]
+            if self._seconds_per_row > 0:
+                limits.append(self.target_latency / self._seconds_per_row)
+            if self.memory_budget and self._bytes_per_row:
+                limits.append(self.memory_budget / self._bytes_per_row)
+            wanted = min(limits)
+
+            # Damp the change, then clamp to the configured bounds
+            wanted = min(wanted, self._size * self.max_step)
+            wanted = max(wanted, self._size / self.max_step)
+            self._size = int(max(self.min_size, min(self.max_size, wanted)))
+            self.history.append({'rows': rows, 'seconds': seconds, 'bytes': nbytes,
+                                 'next_size': self._size})
+            return self._size
+
+    def measure(self, fetch, sample=5):
+        """Call fetch(batch_size), time it, observe the result and return it
+
+        Row width is estimated from the first sample rows of the result.
+        """
+        size = self._size
+        start = time.perf_counter()
+        rows = fetch(size)
+        elapsed = time.perf_counter() - start
+        if rows:
+            head = rows[:sample]
+            nbytes = sum(estimate_row_bytes(row) for row in head) * len(rows) / len(head)
+            self.observe(len(rows), elapsed, nbytes)
+        return rows
+
+    def stats(self):
+        """Current size plus the smoothed per-row measurements"""
+        return {
+            'batch_size': self._size,
+            'seconds_per_row': self._seconds_per_row,
+            'bytes_per_row': self._bytes_per_row,
+            'target_latency': self.target_latency,
+            'memory_budget': self.memory_budget,
+        }
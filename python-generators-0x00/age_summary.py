@@ -0,0 +1,222 @@
+import math
+from collections import Counter
+from fractions import Fraction
+
+# Ages are DECIMAL(3,1), so everything is kept in exact integer tenths
+SUMMARY_TABLES = {
+    'mysql': (
+        """
+        CREATE TABLE IF NOT EXISTS user_age_summary (
+            id TINYINT PRIMARY KEY,
+            user_count BIGINT NOT NULL,
+            age_tenths_sum BIGINT NOT NULL,
+            age_tenths_sum_sq BIGINT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_age_histogram (
+            age_tenths SMALLINT PRIMARY KEY,
+            user_count BIGINT NOT NULL
+        )
+        """,
+    ),
+    'sqlite': (
+        """
+        CREATE TABLE IF NOT EXISTS user_age_summary (
+            id INTEGER PRIMARY KEY,
+            user_count INTEGER NOT NULL,
+            age_tenths_sum INTEGER NOT NULL,
+            age_tenths_sum_sq INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_age_histogram (
+            age_tenths INTEGER PRIMARY KEY,
+            user_count INTEGER NOT NULL
+        )
+        """,
+    ),
+}
+
+# Rows are looked up by key in slices this size, below SQLite's
+# default limit on bound parameters
+LOOKUP_SLICE = 400
+
+
+def _marker(dialect):
+    return '?' if dialect == 'sqlite' else '%s'
+
+
+def to_tenths(age):
+    return int(round(float(age) * 10))
+
+
+def create_summary_tables(cursor, dialect='mysql'):
+    """Create the summary tables, filling them from user_data if they are new"""
+    for statement in SUMMARY_TABLES[dialect]:
+        cursor.execute(statement)
+    ignore = 'OR IGNORE' if dialect == 'sqlite' else 'IGNORE'
+    cursor.execute(f"INSERT {ignore} INTO user_age_summary "
+                   "(id, user_count, age_tenths_sum, age_tenths_sum_sq) VALUES (1, 0, 0, 0)")
+    if cursor.rowcount == 1:
+        rebuild_summary(cursor, dialect)
+
+
+def affected_ages(cursor, chunk, dialect='mysql', lock=False):
+    """{user_id: age in tenths} of stored rows sharing a user_id or email
+    with any (user_id, name, email, age) record in chunk
+
+    These are exactly the rows an insert, upsert or REPLACE of chunk can
+    touch. lock=True takes row locks (MySQL) so nothing changes them
+    between this read and the write.
+    """
+    marker = _marker(dialect)
+    suffix = ' FOR UPDATE' if lock and dialect == 'mysql' else ''
+    ages = {}
+    for start in range(0, len(chunk), LOOKUP_SLICE):
+        records = chunk[start:start + LOOKUP_SLICE]
+        placeholders = ', '.join([marker] * len(records))
+        cursor.execute(
+            f"SELECT user_id, age FROM user_data WHERE user_id IN ({placeholders}) "
+            f"OR email IN ({placeholders}){suffix}",
+            [record[0] for record in records] + [record[2] for record in records]
+        )
+        for user_id, age in cursor.fetchall():
+            ages[bytes(user_id)] = to_tenths(age)
+    return ages
+
+
+def summary_delta(before, after):
+    """(count, sum, sum of squares, histogram) change between two age maps"""
+    histogram = Counter(after.values())
+    histogram.subtract(before.values())
+    count = total = total_sq = 0
+    for tenths, change in histogram.items():
+        count += change
+        total += change * tenths
+        total_sq += change * tenths * tenths
+    return count, total, total_sq, {k: v for k, v in histogram.items() if v}
+
+
+def apply_delta(cursor, delta, dialect='mysql'):
+    """Add a summary_delta to the summary tables in the current transaction"""
+    count, total, total_sq, histogram = delta
+    if not histogram:
+        return
+    marker = _marker(dialect)
+    cursor.execute(
+        f"UPDATE user_age_summary SET user_count = user_count + {marker}, "
+        f"age_tenths_sum = age_tenths_sum + {marker}, "
+        f"age_tenths_sum_sq = age_tenths_sum_sq + {marker} WHERE id = 1",
+        (count, total, total_sq)
+    )
+    if dialect == 'sqlite':
+        upsert = " ON CONFLICT(age_tenths) DO UPDATE SET user_count = user_count + excluded.user_count"
+    else:
+        upsert = " ON DUPLICATE KEY UPDATE user_count = user_count + VALUES(user_count)"
+    buckets = sorted(histogram.items())
+    cursor.execute(
+        "INSERT INTO user_age_histogram (age_tenths, user_count) VALUES "
+        + ', '.join([f"({marker}, {marker})"] * len(buckets)) + upsert,
+        [value for bucket in buckets for value in bucket]
+    )
+
+
+def write_tracked(cursor, chunk, write, dialect='mysql', inserts_only=False):
+    """Run write() and fold its effect on user ages into the summary tables
+
+    Call inside the transaction that writes chunk, so the summary commits
+    or rolls back together with the rows. With inserts_only=True the caller
+    guarantees every record becomes a new row (a plain INSERT that fails as
+    a whole on any duplicate), which saves the two key lookups.
+    """
+    if inserts_only:
+        write()
+        before = {}
+        after = {bytes(record[0]): to_tenths(record[3]) for record in chunk}
+    else:
+        before = affected_ages(cursor, chunk, dialect, lock=True)
+        write()
+        after = affected_ages(cursor, chunk, dialect)
+    apply_delta(cursor, summary_delta(before, after), dialect)
+
+
+def recompute(cursor):
+    """(count, sum, sum of squares, histogram) straight from user_data"""
+    cursor.execute("SELECT ROUND(age * 10), COUNT(*) FROM user_data GROUP BY ROUND(age * 10)")
+    histogram = {int(tenths): count for tenths, count in cursor.fetchall()}
+    return (sum(histogram.values()),
+            sum(tenths * count for tenths, count in histogram.items()),
+            sum(tenths * tenths * count for tenths, count in histogram.items()),
+            histogram)
+
+
+def read_summary(cursor):
+    """(count, sum, sum of squares, histogram) from the maintained tables"""
+    cursor.execute("SELECT user_count, age_tenths_sum, age_tenths_sum_sq "
+                   "FROM user_age_summary WHERE id = 1")
+    row = cursor.fetchone()
+    cursor.execute("SELECT age_tenths, user_count FROM user_age_histogram "
+                   "WHERE user_count > 0")
+    histogram = {int(tenths): count for tenths, count in cursor.fetchall()}
+    if row is None:
+        return 0, 0, 0, histogram
+    return int(row[0]), int(row[1]), int(row[2]), histogram
+
+
+def rebuild_summary(cursor, dialect='mysql'):
+    """Replace the maintained summary with one recomputed from user_data"""
+    count, total, total_sq, histogram = recompute(cursor)
+    cursor.execute("DELETE FROM user_age_histogram")
+    cursor.execute("DELETE FROM user_age_summary")
+    cursor.execute("INSERT INTO user_age_summary "
+                   "(id, user_count, age_tenths_sum, age_tenths_sum_sq) VALUES (1, 0, 0, 0)")
+    apply_delta(cursor, (count, total, total_sq, histogram), dialect)
+
+
+def describe(summary, percentiles=(50, 90, 95, 99)):
+    """Turn a (count, sum, sum of squares, histogram) summary into the same
+    dict StreamingStats.summary() returns
+
+    The work depends on the number of distinct ages (at most 1000), not on
+    the number of users. Percentiles are exact nearest-rank values.
+    """
+    count, total, total_sq, histogram = summary
+    if not count:
+        result = {'count': 0, 'mean': None, 'variance': None, 'stddev': None,
+                  'min': None, 'max': None}
+        result.update({f'p{p:g}': None for p in percentiles})
+        return result
+    mean = Fraction(total, count)
+    variance = float((Fraction(total_sq, count) - mean * mean) / 100)
+    buckets = sorted(tenths for tenths, n in histogram.items() if n > 0)
+    result = {
+        'count': count,
+        'mean': float(mean / 10),
+        'variance': variance,
+        'stddev': math.sqrt(variance),
+        'min': buckets[0] / 10,
+        'max': buckets[-1] / 10,
+    }
+    for p in percentiles:
+        rank = max(1, math.ceil(p / 100 * count))
+        cumulative = 0
+        for tenths in buckets:
+            cumulative += histogram[tenths]
+            if cumulative >= rank:
+                result[f'p{p:g}'] = tenths / 10
+                break
+    return result
+
+
+def verify_summary(cursor):
+    """Recompute the summary from scratch and compare it to the maintained one
+
+    Returns a dict with 'ok' plus both descriptions, so a mismatch shows
+    which figures drifted; rebuild_summary repairs it.
+    """
+    maintained = read_summary(cursor)
+    recomputed = recompute(cursor)
+    return {'ok': maintained == recomputed,
+            'maintained': describe(maintained),
+            'recomputed': describe(recomputed)}
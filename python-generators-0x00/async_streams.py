@@ -0,0 +1,248 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from resume_token import decode_resume_token
+from row_decoder import RowDecoder
+
+
+@asynccontextmanager
+async def _closing(agen):
+    """Close agen when the block is left, even early
+
+    Leaving an async for loop doesn't close the generator it iterates, so
+    without this a closed outer stream would leave its producer and
+    connection running until the loop shuts down.
+    """
+    try:
+        yield agen
+    finally:
+        await agen.aclose()
+
+
+class AioSQLiteSource:
+    """user_data in a SQLite file, read through aiosqlite"""
+
+    marker = '?'
+
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def errors(self):
+        import aiosqlite
+        return (aiosqlite.Error,)
+
+    def connect(self):
+        """Async context manager holding one connection, e.g. for a whole
+        pagination walk"""
+        import aiosqlite
+        return aiosqlite.connect(self.path)
+
+    async def batches(self, query, params, batch_size, connection=None):
+        """Async generator running query and yielding (column names, list
+        of row tuples) pairs
+
+        Runs on connection when given, else on a connection of its own.
+        """
+        if connection is None:
+            async with self.connect() as connection, \
+                    _closing(self.batches(query, params, batch_size, connection)) as batches:
+                async for rows in batches:
+                    yield rows
+            return
+        async with connection.execute(query, params) as cursor:
+            names = [column[0] for column in cursor.description]
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield names, rows
+
+
+class AioMySQLSource:
+    """user_data in MySQL, read through aiomysql with a server-side cursor"""
+
+    marker = '%s'
+
+    def __init__(self, **config):
+        # Imported here so the SQLite source works without mysql.connector
+        from connection_pool import DB_CONFIG
+        self.config = dict(DB_CONFIG, **config)
+
+    @property
+    def errors(self):
+        import pymysql
+        return (pymysql.err.Error,)
+
+    @asynccontextmanager
+    async def connect(self):
+        """Async context manager holding one connection, e.g. for a whole
+        pagination walk"""
+        import aiomysql
+        config = dict(self.config)
+        config['db'] = config.pop('database', None)
+        connection = await aiomysql.connect(**config)
+        try:
+            yield connection
+        finally:
+            # close() drops the socket; a result set abandoned half read is
+            # not drained first (ensure_closed or cursor.close would)
+            connection.close()
+
+    async def batches(self, query, params, batch_size, connection=None):
+        """Async generator running query and yielding (column names, list
+        of row tuples) pairs
+
+        Runs on connection when given, else on a connection of its own. A
+        generator closed before the end leaves its result set unread, so
+        the connection can't run another query and must be closed.
+        """
+        if connection is None:
+            async with self.connect() as connection, \
+                    _closing(self.batches(query, params, batch_size, connection)) as batches:
+                async for rows in batches:
+                    yield rows
+            return
+        import aiomysql
+        # SSCursor streams rows instead of buffering the result set
+        cursor = await connection.cursor(aiomysql.SSCursor)
+        await cursor.execute(query, params)
+        names = [column[0] for column in cursor.description]
+        while True:
+            rows = await cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield names, rows
+        # Fully read, so closing the cursor has nothing left to drain
+        await cursor.close()
+
+
+def default_source():
+    """The MySQL database the blocking generators use"""
+    return AioMySQLSource()
+
+
+async def prefetch(agen, depth):
+    """Run agen ahead of its consumer, keeping at most depth items queued
+
+    Database waits for the next item then overlap with the consumer's work
+    on the current one. Closing the returned generator early cancels the
+    producer and closes agen.
+    """
+    if depth < 1:
+        async with _closing(agen):
+            async for item in agen:
+                yield item
+        return
+
+    queue = asyncio.Queue(maxsize=depth)
+    done = object()
+
+    async def produce():
+        try:
+            async for item in agen:
+                await queue.put((item, None))
+            await queue.put((done, None))
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            await queue.put((done, e))
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                break
+            yield item
+    finally:
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+        await agen.aclose()
+
+
+async def _batches(source, query, params, batch_size, connection=None):
+    """Decoded batches, or a single None after printing a database error"""
+    decoder = None
+    try:
+        async with _closing(source.batches(query, params, batch_size, connection)) as batches:
+            async for names, rows in batches:
+                if decoder is None:
+                    # Resolve column positions and the UUID conversion once per query
+                    decoder = RowDecoder(names)
+                yield decoder.decode_many(rows)
+    except source.errors as e:
+        print(f"Database error: {e}")
+        yield None
+
+
+async def astream_users_in_batches(batch_size, source=None, prefetch_depth=2):
+    """Async counterpart of stream_users_in_batches"""
+    source = source or default_source()
+    batches = _batches(source, "SELECT * FROM user_data", (), batch_size)
+    async with _closing(prefetch(batches, prefetch_depth)) as ahead:
+        async for batch in ahead:
+            yield batch
+
+
+async def astream_users(source=None, fetch_size=1000, prefetch_depth=2):
+    """Async counterpart of stream_users, yielding users one by one
+
+    Rows are fetched fetch_size at a time with up to prefetch_depth fetches
+    in flight ahead of the consumer.
+    """
+    async with _closing(astream_users_in_batches(fetch_size, source,
+                                                 prefetch_depth)) as batches:
+        async for batch in batches:
+            if batch is None:
+                yield None
+                continue
+            for user in batch:
+                yield user
+
+
+async def _pages(source, page_size, last_user_id):
+    m = source.marker
+    try:
+        # One connection for the whole walk instead of a connect per page
+        async with source.connect() as connection:
+            while True:
+                if last_user_id is None:
+                    query = f"SELECT * FROM user_data ORDER BY user_id LIMIT {m}"
+                    params = (page_size,)
+                else:
+                    query = (f"SELECT * FROM user_data WHERE user_id > {m} "
+                             f"ORDER BY user_id LIMIT {m}")
+                    params = (last_user_id, page_size)
+                page = []
+                async with _closing(_batches(source, query, params, page_size,
+                                             connection)) as batches:
+                    async for batch in batches:
+                        if batch is None:
+                            return
+                        page.extend(batch)
+                if not page:  # No more users to fetch
+                    return
+                yield page
+                last_user_id = bytes.fromhex(page[-1]['user_id'])
+    except source.errors as e:
+        print(f"Database error: {e}")
+
+
+async def alazy_paginate(page_size, source=None, resume_token=None, prefetch_depth=1):
+    """Async counterpart of lazy_paginate (keyset pages, resumable)
+
+    Resume tokens come from resume_token.page_token(), as for
+    lazy_paginate. All pages are read over one connection.
+    """
+    source = source or default_source()
+    last_user_id = decode_resume_token(resume_token) if resume_token else None
+    async with _closing(prefetch(_pages(source, page_size, last_user_id),
+                                 prefetch_depth)) as pages:
+        async for page in pages:
+            yield page
@@ -0,0 +1,321 @@
+import argparse
+import csv
+import functools
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+from columnar import batch_length
+from connection_pool import configure_pool
+from row_decoder import RowDecoder
+from sqlite_backend import SQLiteConnection
+from synthetic import create_mysql_dataset, create_sqlite_dataset, generate_users
+
+# Database the measured generators read from; set with use_backend()
+BACKEND = {'type': 'mysql'}
+
+# Access patterns measured by the 'patterns' suite: (name, target, kwargs)
+ACCESS_PATTERNS = [
+    ('stream_users', '0-stream_users:stream_users', {}),
+    ('stream_users_buffered', '0-stream_users:stream_users', {'buffered': True}),
+    ('stream_users_unbuffered', '0-stream_users:stream_users',
+     {'unbuffered': True}),
+    ('stream_users_in_batches', '1-batch_processing:stream_users_in_batches',
+     {'batch_size': 1000}),
+    ('batch_processing', '1-batch_processing:batch_processing',
+     {'batch_size': 1000}),
+    ('lazy_paginate', '2-lazy_paginate:lazy_paginate', {'page_size': 1000}),
+    ('stream_user_ages', '4-stream_ages:stream_user_ages', {}),
+]
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of the current process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def count_rows(item):
+    """Number of rows carried by one item yielded from a generator"""
+    if item is None:
+        return 0
+    if isinstance(item, dict):
+        # A dict of column arrays is a columnar batch; any other dict is a row
+        columnar = any(hasattr(value, 'dtype') for value in item.values())
+        return batch_length(item) if columnar else 1
+    if isinstance(item, list) or hasattr(item, 'dtype'):
+        return batch_length(item)
+    return 1
+
+
+def use_backend(kind='mysql', path=None, **config):
+    """Point measurements at MySQL (config as for ConnectionPool) or SQLite"""
+    global BACKEND
+    if kind == 'sqlite':
+        BACKEND = {'type': 'sqlite', 'path': os.path.abspath(path)}
+    else:
+        BACKEND = {'type': 'mysql', **config}
+    return BACKEND
+
+
+def _configure_backend(backend):
+    """Configure the shared connection pool of a measuring process"""
+    options = {key: value for key, value in backend.items() if key != 'type'}
+    if backend['type'] == 'sqlite':
+        configure_pool(connect=functools.partial(SQLiteConnection, options['path']))
+    else:
+        configure_pool(**options)
+
+
+def _measure(target, kwargs, backend=None):
+    """Drain target(**kwargs) and report throughput and memory"""
+    if backend is not None:
+        _configure_backend(backend)
+    module_name, func_name = target.split(':')
+    func = getattr(importlib.import_module(module_name), func_name)
+
+    rss_before = peak_rss_mb()
+    rows = 0
+    first_row = None
+    start = time.perf_counter()
+    result = func(**kwargs)
+    if hasattr(result, '__next__'):
+        for item in result:
+            if first_row is None:
+                first_row = time.perf_counter() - start
+            rows += count_rows(item)
+    elif isinstance(result, dict):
+        # Non-generator targets such as seed.load_csv report their own count
+        rows = result.get('rows', 0)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'target': target,
+        'kwargs': kwargs,
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed if elapsed > 0 else 0.0,
+        'time_to_first_row': first_row,
+        'peak_rss_mb': peak_rss_mb(),
+        'peak_rss_delta_mb': peak_rss_mb() - rss_before,
+    }
+
+
+def measure(target, **kwargs):
+    """Measure target ("module:function") in a fresh interpreter
+
+    Peak RSS only ever grows within a process, so every measurement runs in
+    its own spawned child to keep one run from hiding the next.
+    """
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        return pool.apply(_measure, (target, kwargs, BACKEND))
+
+
+def bench_patterns(patterns=None):
+    """Rows/s, time to first row and peak RSS for every access pattern"""
+    results = []
+    for name, target, kwargs in ACCESS_PATTERNS:
+        if patterns and name not in patterns:
+            continue
+        result = measure(target, **kwargs)
+        result['pattern'] = name
+        results.append(result)
+    return results
+
+
+def bench_stream_users(fetch_size=1000):
+    """Compare buffered, default (fetchone) and unbuffered fetchmany stream_users
+
+    The buffered run holds the whole result in client memory, so its peak
+    RSS is the baseline for the unbuffered run's.
+    """
+    return [
+        measure('0-stream_users:stream_users', buffered=True),
+        measure('0-stream_users:stream_users', unbuffered=False),
+        measure('0-stream_users:stream_users', unbuffered=True,
+                fetch_size=fetch_size),
+    ]
+
+
+def bench_columnar(batch_size=10000):
+    """Compare list-of-dicts and columnar batches through batch_processing
+
+    Every run fetches all users (pushdown=False), so the age filter runs in
+    Python: per row for the list batches, as a NumPy mask for columnar ones.
+    """
+    return [
+        measure('1-batch_processing:batch_processing', batch_size=batch_size,
+                pushdown=False),
+        measure('1-batch_processing:batch_processing', batch_size=batch_size,
+                pushdown=False, columnar='columns'),
+        measure('1-batch_processing:batch_processing', batch_size=batch_size,
+                pushdown=False, columnar='structured'),
+    ]
+
+
+def write_synthetic_csv(path, rows, seed=0, with_user_id=False):
+    """Write a user_data CSV with rows random users, like user_data.csv"""
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        header = ['name', 'email', 'age']
+        writer.writerow((['user_id'] if with_user_id else []) + header)
+        for user_id, name, email, age in generate_users(rows, seed):
+            record = [name, email, age]
+            if with_user_id:
+                record.insert(0, str(uuid.UUID(bytes=user_id)))
+            writer.writerow(record)
+    return path
+
+
+def bench_seed(rows=10_000_000, chunk_size=10000, methods=('infile', 'insert')):
+    """Rows/s and peak RSS of seed.load_csv for a synthetic CSV file
+
+    user_data is truncated before each method so every run loads the same
+    rows into an empty table.
+    """
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    try:
+        write_synthetic_csv(path, rows)
+        return [measure('seed:load_csv', filename=path, chunk_size=chunk_size,
+                        method=method, truncate=True)
+                for method in methods]
+    finally:
+        os.unlink(path)
+
+
+def _legacy_decode(rows, names):
+    """The pre-decoder path: dict cursor rows fixed up one key at a time"""
+    for row in rows:
+        user = dict(zip(names, row))  # what cursor(dictionary=True) builds
+        if 'user_id' in user and isinstance(user['user_id'], bytes):
+            user['user_id'] = user['user_id'].hex()
+        yield user
+
+
+def bench_decoder(rows=1_000_000, seed=0):
+    """Time decoding rows tuples: legacy dict path vs RowDecoder
+
+    Runs in-process on synthetic driver tuples, so only the decoding cost is
+    measured. Bytes per row is the size of one decoded row object.
+    """
+    names = ('user_id', 'name', 'email', 'age')
+    raw = list(generate_users(rows, seed))
+    decoder = RowDecoder(names)
+    modes = {
+        'legacy_dict': lambda: _legacy_decode(raw, names),
+        'decoder_dict': lambda: map(decoder.to_dict, raw),
+        'decoder_record': lambda: map(decoder.to_record, raw),
+    }
+    results = []
+    for mode, run in modes.items():
+        start = time.perf_counter()
+        last = None
+        for last in run():
+            pass
+        elapsed = time.perf_counter() - start
+        results.append({
+            'target': 'row_decoder',
+            'kwargs': {'mode': mode, 'rows': rows},
+            'rows': rows,
+            'seconds': elapsed,
+            'rows_per_second': rows / elapsed if elapsed > 0 else 0.0,
+            'bytes_per_row': sys.getsizeof(last),
+            'peak_rss_mb': peak_rss_mb(),
+        })
+    return results
+
+
+def print_results(results):
+    """Print results as a small table"""
+    for result in results:
+        options = ', '.join(f"{k}={v}" for k, v in result['kwargs'].items())
+        first_row = result.get('time_to_first_row')
+        print(f"{result['target']}({options}): "
+              f"{result['rows']} rows, "
+              f"{result['rows_per_second']:.0f} rows/s, "
+              + (f"first row {first_row * 1000:.1f} ms, " if first_row is not None else "")
+              + f"peak RSS {result['peak_rss_mb']:.1f} MB")
+
+
+def report(suite, results, dataset_rows=None):
+    """Results plus the metadata needed to compare runs over time"""
+    backend = {key: value for key, value in BACKEND.items() if key != 'password'}
+    return {
+        'suite': suite,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': backend,
+        'dataset_rows': dataset_rows,
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the user streaming generators")
+    parser.add_argument('suite', choices=['patterns', 'stream_users', 'columnar', 'seed',
+                                          'decoder'])
+    parser.add_argument('--backend', choices=['mysql', 'sqlite'], default='mysql')
+    parser.add_argument('--sqlite-path', default='benchmark.sqlite3',
+                        help="SQLite database used with --backend sqlite")
+    parser.add_argument('--generate', type=int, metavar='ROWS',
+                        help="(re)create user_data with ROWS synthetic users first")
+    parser.add_argument('--seed', type=int, default=0, help="synthetic data seed")
+    parser.add_argument('--pattern', action='append',
+                        choices=[name for name, _, _ in ACCESS_PATTERNS],
+                        help="access pattern(s) to measure in the patterns suite")
+    parser.add_argument('--fetch-size', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--rows', type=int,
+                        help="rows to generate (seed: 10M, decoder: 1M by default)")
+    parser.add_argument('--method', action='append', choices=['infile', 'insert'],
+                        help="seed loading method(s) to measure")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    parser.add_argument('--output', metavar='FILE', help="write the JSON report to FILE")
+    args = parser.parse_args(argv)
+
+    if args.suite == 'seed' and args.backend != 'mysql':
+        parser.error("the seed suite loads through LOAD DATA/INSERT into MySQL")
+    use_backend(args.backend, path=args.sqlite_path)
+    if args.generate is not None:
+        if args.backend == 'sqlite':
+            create_sqlite_dataset(args.sqlite_path, args.generate, args.seed)
+        else:
+            create_mysql_dataset(args.generate, args.seed)
+
+    if args.suite == 'patterns':
+        results = bench_patterns(args.pattern)
+    elif args.suite == 'stream_users':
+        results = bench_stream_users(fetch_size=args.fetch_size)
+    elif args.suite == 'columnar':
+        results = bench_columnar(batch_size=args.batch_size)
+    elif args.suite == 'decoder':
+        results = bench_decoder(rows=args.rows or 1_000_000)
+    else:
+        results = bench_seed(rows=args.rows or 10_000_000, chunk_size=args.batch_size,
+                             methods=args.method or ('infile', 'insert'))
+    document = report(args.suite, results, dataset_rows=args.generate)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(document, file, indent=2, default=str)
+    if args.json:
+        print(json.dumps(document, indent=2, default=str))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+from decimal import Decimal
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the columnar batch modes
+    np = None
+
+COLUMNAR_MODES = ('columns', 'structured')
+
+
+def require_numpy():
+    """Fail early with a useful message when numpy is missing"""
+    if np is None:
+        raise ImportError("Columnar batches require numpy: pip install numpy")
+
+
+def _column_dtype(values):
+    types = {type(value) for value in values if value is not None}
+    if not types:
+        return object
+    if types <= {bytes, bytearray}:
+        # 'S' would strip trailing NUL bytes off keys such as user_id, and
+        # 'V' pads short values with them, so only fixed-width columns
+        # without NULLs become raw void fields
+        widths = {len(value) if value is not None else None for value in values}
+        if len(widths) == 1 and None not in widths:
+            return f'V{max(widths.pop(), 1)}'
+        return object
+    if types == {bool}:
+        return '?'
+    if types == {int}:
+        return 'i8'
+    if types <= {int, float, Decimal}:
+        # e.g. SQLite stores DECIMAL 61.0 as the integer 61 and 25.5 as a
+        # float, so one column can mix both
+        return 'f8'
+    return object
+
+
+def infer_dtype(names, rows):
+    """Build a structured dtype from column names and a batch of rows
+
+    Every value is looked at, not just the first. Fixed-width binary
+    columns (the 16-byte user_id) become raw void fields, so no per-row hex
+    string is created and every byte is kept; bytes(value) gives the key
+    back. Integer columns become int64, columns holding any float or
+    Decimal become float64 and anything else is kept as a Python object.
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    return np.dtype([(name, _column_dtype(values)) for name, values in zip(names, columns)])
+
+
+def widen_dtype(dtype, other):
+    """The narrowest structured dtype that holds values of both dtypes
+
+    int64 and float64 widen to float64; fields that disagree otherwise,
+    including binary fields of different widths, become Python objects.
+    """
+    fields = []
+    for name in dtype.names:
+        first, second = dtype[name], other[name]
+        if first == second:
+            fields.append((name, first))
+        elif {first.kind, second.kind} == {'i', 'f'}:
+            fields.append((name, 'f8'))
+        else:
+            fields.append((name, object))
+    return np.dtype(fields)
+
+
+def to_structured(names, rows, dtype=None):
+    """Turn a list of row tuples into a NumPy structured array
+
+    dtype, typically the one of the stream's previous batch, is widened as
+    far as this batch needs (see widen_dtype), so a value is never
+    truncated to fit a dtype inferred from earlier rows.
+    """
+    require_numpy()
+    inferred = infer_dtype(names, rows)
+    if dtype is not None:
+        inferred = widen_dtype(dtype, inferred)
+    return np.array([tuple(row) for row in rows], dtype=inferred)
+
+
+def comparable(column):
+    """column in a form that compares with Python values
+
+    Void (binary) fields only support == against np.void scalars, so they
+    are viewed as fixed-width bytes; both sides have the same width, so
+    order and equality are those of the raw keys.
+    """
+    if column.dtype.kind == 'V' and column.dtype.names is None:
+        return column.view(f'S{column.dtype.itemsize}')
+    return column
+
+
+def to_columns(records):
+    """Split a structured array into a dict of per-column arrays"""
+    return {name: records[name] for name in records.dtype.names}
+
+
+def batch_length(batch):
+    """Number of rows in a dict-of-columns, structured or list batch"""
+    if isinstance(batch, dict):
+        return len(next(iter(batch.values()), ()))
+    return len(batch)
+
+
+def filter_batch(batch, mask):
+    """Keep the rows of a columnar batch where mask is true"""
+    if isinstance(batch, dict):
+        return {name: column[mask] for name, column in batch.items()}
+    return batch[mask]
@@ -0,0 +1,190 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',  # Replace with your MySQL username
+    'password': '',  # Replace with your MySQL password
+    'database': 'ALX_prodev',
+}
+
+
+class ConnectionPool:
+    """A small, bounded pool of database connections
+
+    Connections are opened lazily up to max_size and handed back out on
+    later checkouts instead of reconnecting. Every checkout runs a health
+    check and transparently replaces connections the server has dropped.
+    connect can be any zero-argument factory returning a DB-API connection;
+    it defaults to mysql.connector.connect with DB_CONFIG plus config.
+    """
+
+    def __init__(self, max_size=5, timeout=30, connect=None, **config):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.timeout = timeout
+        self.config = dict(DB_CONFIG, **config)
+        self._factory = connect
+        # LIFO so the most recently used (warmest) connection goes out first
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._counters = {'opened': 0, 'reused': 0, 'discarded': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    @staticmethod
+    def _is_healthy(connection):
+        """Cheap liveness check run on every checkout"""
+        try:
+            if hasattr(connection, 'is_connected'):
+                return connection.is_connected()
+            connection.cursor().execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Check a connection out of the pool, opening one if needed"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError(f"No connection available within {self.timeout}s "
+                            f"(max_size={self.max_size})")
+        try:
+            while True:
+                try:
+                    connection = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if self._is_healthy(connection):
+                    self._count('reused')
+                    return connection
+                self._count('discarded')
+                self._close(connection)
+
+            if self._factory is not None:
+                connection = self._factory()
+            else:
+                connection = mysql.connector.connect(**self.config)
+            self._count('opened')
+            return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, discard=False):
+        """Return a connection to the pool
+
+        Pass discard=True when the connection is in an unknown state, e.g.
+        an unbuffered result set was abandoned half read; it is closed
+        instead of being handed to the next caller.
+        """
+        try:
+            if not discard:
+                try:
+                    # Never leak an open transaction into the next checkout
+                    connection.rollback()
+                except Exception:
+                    discard = True
+            if discard:
+                self._count('discarded')
+                self._close(connection)
+            else:
+                self._idle.put(connection)
+        finally:
+            self._slots.release()
+
+    def release_stream(self, connection, cursor=None, exhausted=True):
+        """Close a streaming cursor and return its connection
+
+        Generators call this from their finally block. A cursor abandoned
+        before its last row (exhausted=False) may still have rows pending on
+        the socket, and closing it would read them all or raise "Unread
+        result found"; the connection is discarded instead, which drops
+        them on the server. The slot is given back in every case.
+        """
+        if exhausted and cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                exhausted = False
+        self.release(connection, discard=not exhausted)
+
+    @contextmanager
+    def connection(self):
+        """Context manager wrapping acquire() and release()"""
+        connection = self.acquire()
+        try:
+            yield connection
+        except Error:
+            self.release(connection, discard=True)
+            raise
+        except BaseException:
+            self.release(connection)
+            raise
+        else:
+            self.release(connection)
+
+    def stats(self):
+        """Counters showing how often connections were opened versus reused"""
+        with self._lock:
+            stats = dict(self._counters)
+        stats['idle'] = self._idle.qsize()
+        stats['max_size'] = self.max_size
+        return stats
+
+    def close(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure_pool(**options):
+    """Replace the shared pool, e.g. configure_pool(max_size=10, host='db')"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(**options)
+        return _pool
+
+
+def get_pool():
+    """Return the pool shared by the generator modules
+
+    Connections must never cross a fork, so a child process that inherits
+    the pool gets a fresh one with the same settings.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        elif _pool._pid != os.getpid():
+            _pool = ConnectionPool(max_size=_pool.max_size,
+                                   timeout=_pool.timeout,
+                                   connect=_pool._factory,
+                                   **_pool.config)
+        return _pool
@@ -0,0 +1,197 @@
+import argparse
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from functools import partial
+
+from pipeline import source
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).hex()
+    return value
+
+
+def serialize(names, rows, export_format):
+    """Encode row tuples as UTF-8 NDJSON lines or CSV rows (no header)"""
+    if export_format == 'ndjson':
+        return ''.join(json.dumps(dict(zip(names, map(_json_value, row))),
+                                  separators=(',', ':')) + '\n'
+                       for row in rows).encode('utf-8')
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerows([_json_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+def gzip_member(data, level=6):
+    """Compress data as one complete gzip member
+
+    Members can be concatenated into a valid gzip file, so every chunk is
+    compressed on its own and the output is still read by gzip/zcat.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _to_rows(batch):
+    if batch is None:
+        raise RuntimeError("Database error while exporting user_data")
+    # Plain tuples pickle much faster than dicts
+    return tuple(batch[0].keys()), [tuple(row.values()) for row in batch]
+
+
+def _compress_chunk(chunk, export_format, level):
+    """Worker: serialize and compress one batch of (names, rows)
+
+    Returns (names, gzip member, row count).
+    """
+    names, rows = chunk
+    return names, gzip_member(serialize(names, rows, export_format), level), len(rows)
+
+
+class _PartWriter:
+    """Writes gzip members to numbered part files of at most max_bytes"""
+
+    def __init__(self, prefix, export_format, names, max_bytes, level):
+        self.prefix = prefix
+        self.extension = f"{'jsonl' if export_format == 'ndjson' else 'csv'}.gz"
+        self.header = None
+        if export_format == 'csv':
+            self.header = gzip_member(serialize((), [names], 'csv'), level)
+        self.max_bytes = max_bytes
+        self.parts = []
+        self.file = None
+
+    def _open(self):
+        path = f"{self.prefix}-{len(self.parts):05d}.{self.extension}"
+        self.file = open(f"{path}.tmp", 'wb')
+        self.parts.append({'path': path, 'rows': 0, 'bytes': 0})
+        if self.header is not None:
+            self._write(self.header, 0)
+
+    def _write(self, member, rows):
+        self.file.write(member)
+        self.parts[-1]['bytes'] += len(member)
+        self.parts[-1]['rows'] += rows
+
+    def _close(self):
+        if self.file is not None:
+            self.file.close()
+            os.replace(f"{self.parts[-1]['path']}.tmp", self.parts[-1]['path'])
+            self.file = None
+
+    def write(self, member, rows):
+        part = self.parts[-1] if self.file is not None else None
+        # A part always takes at least one chunk, so it can only overshoot
+        # max_bytes when a single chunk is larger than that
+        if part is not None and self.max_bytes and part['rows'] \
+                and part['bytes'] + len(member) > self.max_bytes:
+            self._close()
+        if self.file is None:
+            self._open()
+        self._write(member, rows)
+
+    def close(self):
+        self._close()
+
+    def abort(self):
+        if self.file is not None:
+            self.file.close()
+            os.unlink(f"{self.parts[-1]['path']}.tmp")
+            self.file = None
+
+
+def export_users(prefix, export_format='ndjson', batch_size=10000, workers=None,
+                 max_bytes=None, level=6, max_pending=None, batches=None):
+    """Export user_data as gzip-compressed NDJSON or CSV part files
+
+    Rows are streamed with stream_users_in_batches through a pipeline
+    whose compression stage runs in a process pool (see pipeline.py), so
+    the CPU-bound part scales with workers while the database is read
+    sequentially. At most max_pending batches (default 2 per worker) are
+    in flight, which bounds memory however large the table is. Compressed
+    chunks are written in stream order.
+
+    Every chunk is a complete gzip member, so each part file decompresses
+    on its own (gzip -dc, zcat, gzip.open). max_bytes starts a new part file
+    before one would grow past that many compressed bytes; CSV parts each
+    begin with the header row. A manifest listing the parts is written to
+    PREFIX.manifest.json so consumers can read the parts in parallel.
+
+    Returns the manifest dict.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"export_format must be one of {EXPORT_FORMATS}")
+    if batches is None:
+        batches = __import__('1-batch_processing').stream_users_in_batches(batch_size)
+
+    chunks = (source(batches)
+              .filter(lambda batch: batch is None or len(batch) > 0)
+              .map(_to_rows)
+              .map(partial(_compress_chunk, export_format=export_format, level=level),
+                   executor='process', workers=workers, max_pending=max_pending))
+    names = None
+    writer = None
+    total = 0
+    iterator = iter(chunks)
+    try:
+        for names, member, count in iterator:
+            if writer is None:
+                writer = _PartWriter(prefix, export_format, names, max_bytes, level)
+            writer.write(member, count)
+            total += count
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    finally:
+        iterator.close()
+        close = getattr(batches, 'close', None)
+        if close is not None:
+            close()
+
+    if writer is not None:
+        writer.close()
+    manifest = {
+        'format': export_format,
+        'compression': 'gzip',
+        'columns': list(names or ()),
+        'rows': total,
+        'parts': writer.parts if writer is not None else [],
+    }
+    tmp_path = f"{prefix}.manifest.json.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_path, f"{prefix}.manifest.json")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export user_data as compressed NDJSON or CSV")
+    parser.add_argument('prefix', help="output files are PREFIX-00000.jsonl.gz, ...")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--max-bytes', type=int, help="split parts at this compressed size")
+    parser.add_argument('--level', type=int, default=6, help="gzip compression level")
+    args = parser.parse_args(argv)
+
+    manifest = export_users(args.prefix, args.format, args.batch_size, args.workers,
+                            args.max_bytes, args.level)
+    print(f"Exported {manifest['rows']} users to {len(manifest['parts'])} part(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import operator
+import re
+
+from columnar import comparable, filter_batch, np
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+_OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '=': operator.eq,
+    '!=': operator.ne,
+}
+
+
+def _identifier(name):
+    """Column names are spliced into SQL, so only plain identifiers pass"""
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid column name: {name!r}")
+    return name
+
+
+class Predicate:
+    """Base class for filter expressions; combine them with & and |"""
+
+    def __and__(self, other):
+        return BoolOp('AND', self, other)
+
+    def __or__(self, other):
+        return BoolOp('OR', self, other)
+
+    def to_sql(self):
+        """Return (sql_fragment, params) using %s placeholders"""
+        raise NotImplementedError
+
+    def matches(self, row):
+        """Evaluate the predicate against one dict row"""
+        raise NotImplementedError
+
+    def mask(self, columns):
+        """Evaluate the predicate against columnar data, returning a bool array"""
+        raise NotImplementedError
+
+
+class Comparison(Predicate):
+    """column <op> value"""
+
+    def __init__(self, column, op, value):
+        if op not in _OPERATORS:
+            raise ValueError(f"Unsupported operator: {op!r}")
+        self.column = _identifier(column)
+        self.op = op
+        self.value = value
+
+    def to_sql(self):
+        return f"{self.column} {self.op} %s", [self.value]
+
+    def matches(self, row):
+        return _OPERATORS[self.op](row[self.column], self.value)
+
+    def mask(self, columns):
+        return _OPERATORS[self.op](comparable(columns[self.column]), self.value)
+
+    def __repr__(self):
+        return f"({self.column} {self.op} {self.value!r})"
+
+
+class In(Predicate):
+    """column IN (values...)"""
+
+    def __init__(self, column, values):
+        self.column = _identifier(column)
+        self.values = list(values)
+
+    def to_sql(self):
+        if not self.values:
+            return "1 = 0", []
+        placeholders = ', '.join(['%s'] * len(self.values))
+        return f"{self.column} IN ({placeholders})", list(self.values)
+
+    def matches(self, row):
+        return row[self.column] in self.values
+
+    def mask(self, columns):
+        return np.isin(comparable(columns[self.column]), self.values)
+
+    def __repr__(self):
+        return f"({self.column} IN {self.values!r})"
+
+
+class BoolOp(Predicate):
+    """AND / OR of two predicates"""
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def to_sql(self):
+        left_sql, left_params = self.left.to_sql()
+        right_sql, right_params = self.right.to_sql()
+        return f"({left_sql} {self.op} {right_sql})", left_params + right_params
+
+    def matches(self, row):
+        if self.op == 'AND':
+            return self.left.matches(row) and self.right.matches(row)
+        return self.left.matches(row) or self.right.matches(row)
+
+    def mask(self, columns):
+        if self.op == 'AND':
+            return self.left.mask(columns) & self.right.mask(columns)
+        return self.left.mask(columns) | self.right.mask(columns)
+
+    def __repr__(self):
+        return f"({self.left!r} {self.op} {self.right!r})"
+
+
+class Column:
+    """Column reference used to build predicates: Column('age') > 25"""
+
+    def __init__(self, name):
+        self.name = _identifier(name)
+
+    def __gt__(self, value):
+        return Comparison(self.name, '>', value)
+
+    def __ge__(self, value):
+        return Comparison(self.name, '>=', value)
+
+    def __lt__(self, value):
+        return Comparison(self.name, '<', value)
+
+    def __le__(self, value):
+        return Comparison(self.name, '<=', value)
+
+    def __eq__(self, value):
+        return Comparison(self.name, '=', value)
+
+    def __ne__(self, value):
+        return Comparison(self.name, '!=', value)
+
+    __hash__ = object.__hash__
+
+    def isin(self, values):
+        return In(self.name, values)
+
+
+class Filter:
+    """A predicate plus an optional column list
+
+    select() compiles both into a parameterized query so the database only
+    returns the wanted rows and columns. When the source can't run SQL,
+    apply() evaluates the same filter on list-of-dict or columnar batches.
+    """
+
+    def __init__(self, predicate=None, columns=None):
+        self.predicate = predicate
+        self.columns = [_identifier(c) for c in columns] if columns else None
+
+    def where(self):
+        """Return (" WHERE ...", params), or ("", []) without a predicate"""
+        if self.predicate is None:
+            return "", []
+        sql, params = self.predicate.to_sql()
+        return f" WHERE {sql}", params
+
+    def select(self, table, order_by=None):
+        """Return (query, params) for SELECT <columns> FROM table WHERE ..."""
+        columns = ', '.join(self.columns) if self.columns else '*'
+        where, params = self.where()
+        query = f"SELECT {columns} FROM {_identifier(table)}{where}"
+        if order_by:
+            query += f" ORDER BY {_identifier(order_by)}"
+        return query, params
+
+    def _project(self, row):
+        if self.columns is None:
+            return row
+        return {name: row[name] for name in self.columns}
+
+    def apply(self, batch):
+        """Filter and project one batch in Python (the fallback path)"""
+        if isinstance(batch, list):
+            if self.predicate is not None:
+                batch = [row for row in batch if self.predicate.matches(row)]
+            return [self._project(row) for row in batch] if self.columns else batch
+        # Columnar batch: dict of arrays or structured array
+        if self.predicate is not None:
+            batch = filter_batch(batch, self.predicate.mask(batch))
+        if self.columns is None:
+            return batch
+        if isinstance(batch, dict):
+            return {name: batch[name] for name in self.columns}
+        return batch[self.columns]
+
+    def apply_all(self, batches):
+        """Generator applying the filter to every batch of an iterable"""
+        for batch in batches:
+            if batch is None:
+                continue
+            yield self.apply(batch)
+
+    def __repr__(self):
+        return f"Filter({self.predicate!r}, columns={self.columns!r})"
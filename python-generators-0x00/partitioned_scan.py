@@ -0,0 +1,184 @@
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor
+
+from mysql.connector import Error
+from connection_pool import configure_pool, get_pool
+from filters import Comparison, Filter
+from row_decoder import RowDecoder
+from stats import StreamingStats, merge_all
+
+KEY_BYTES = 16  # user_id is BINARY(16)
+
+_queues = None
+_stop = None
+
+
+def key_ranges(partitions):
+    """Split the user_id keyspace into equal ranges
+
+    Returns [(low, high), ...] with low inclusive and high exclusive; None
+    means unbounded. user_ids are random (version 4) UUIDs, so equal slices
+    of the keyspace hold roughly equal numbers of rows.
+    """
+    if partitions < 1:
+        raise ValueError("partitions must be at least 1")
+    space = 1 << (8 * KEY_BYTES)
+    bounds = [None]
+    bounds += [(space * i // partitions).to_bytes(KEY_BYTES, 'big')
+               for i in range(1, partitions)]
+    bounds.append(None)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def range_filter(low, high, user_filter=None):
+    """Filter restricting user_filter to one user_id range"""
+    predicate = user_filter.predicate if user_filter is not None else None
+    for bound in (Comparison('user_id', '>=', low) if low is not None else None,
+                  Comparison('user_id', '<', high) if high is not None else None):
+        if bound is not None:
+            predicate = bound if predicate is None else bound & predicate
+    columns = user_filter.columns if user_filter is not None else None
+    return Filter(predicate, columns)
+
+
+def scan_range(low, high, batch_size, user_filter=None):
+    """Generator streaming the users of one key range in batches"""
+    pool = get_pool()
+    exhausted = False
+    try:
+        connection = pool.acquire()
+        cursor = connection.cursor()
+        query, params = range_filter(low, high, user_filter).select('user_data',
+                                                                  order_by='user_id')
+        cursor.execute(query, params)
+        decode = RowDecoder.from_cursor(cursor).decoder()
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                exhausted = True
+                break
+            yield [decode(row) for row in rows]
+    finally:
+        if 'connection' in locals():
+            pool.release_stream(connection, locals().get('cursor'), exhausted)
+
+
+def _init_worker(result_queues, stop, pool_options):
+    global _queues, _stop
+    _queues = result_queues
+    _stop = stop
+    # The parent may be abandoned mid-stream; don't block exit on unread data
+    for result_queue in set(_queues):
+        result_queue.cancel_join_thread()
+    configure_pool(**pool_options)
+
+
+def _configure_worker_pool(options):
+    configure_pool(**options)
+
+
+def _put(index, item):
+    """Put into partition index's bounded result queue unless the consumer
+    has gone away"""
+    while not _stop.is_set():
+        try:
+            _queues[index].put((index, item), timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _scan_worker(index, low, high, batch_size, user_filter):
+    try:
+        for batch in scan_range(low, high, batch_size, user_filter):
+            if not _put(index, batch):
+                return
+    except Exception as e:
+        _put(index, e)
+    # None marks the end of a partition
+    _put(index, None)
+
+
+def _pool_options(pool):
+    """Settings for a one-connection pool in each worker process"""
+    return {'max_size': 1, 'timeout': pool.timeout, 'connect': pool._factory,
+            **pool.config}
+
+
+def partitioned_batches(partitions=4, batch_size=1000, ordered=False,
+                        user_filter=None, max_pending=None):
+    """Stream user_data in batches, scanning key ranges in parallel processes
+
+    Each of the partitions key ranges is read by its own worker process
+    over its own connection. With ordered=False batches are yielded as soon
+    as any worker produces them; ordered=True yields them in user_id order,
+    reading each range to the end before the next. At most max_pending
+    batches (default 2 per partition) wait to be consumed, so slow
+    consumers apply backpressure to the workers. In ordered mode every
+    range gets its own share of that bound, so workers on later ranges
+    block once their share is full instead of piling batches up in the
+    parent.
+    """
+    context = multiprocessing.get_context()
+    max_pending = max_pending or 2 * partitions
+    if ordered:
+        per_partition = max(max_pending // partitions, 1)
+        result_queues = [context.Queue(maxsize=per_partition) for _ in range(partitions)]
+    else:
+        result_queues = [context.Queue(maxsize=max_pending)] * partitions
+    stop = context.Event()
+    options = _pool_options(get_pool())
+    ranges = key_ranges(partitions)
+
+    executor = ProcessPoolExecutor(max_workers=partitions, mp_context=context,
+                                   initializer=_init_worker,
+                                   initargs=(result_queues, stop, options))
+    try:
+        for index, (low, high) in enumerate(ranges):
+            executor.submit(_scan_worker, index, low, high, batch_size, user_filter)
+
+        # Ordered: drain each range's queue in turn; unordered: one shared queue
+        sources = result_queues if ordered else result_queues[:1]
+        remaining = 1 if ordered else partitions
+        for result_queue in sources:
+            finished = 0
+            while finished < remaining:
+                index, item = result_queue.get()
+                if item is None:
+                    finished += 1
+                elif isinstance(item, Exception):
+                    if not isinstance(item, Error):
+                        raise item
+                    print(f"Database error: {item}")
+                    yield None
+                else:
+                    yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _aggregate_worker(low, high, column, batch_size):
+    stats = StreamingStats()
+    user_filter = Filter(columns=[column])
+    for batch in scan_range(low, high, batch_size, user_filter):
+        for row in batch:
+            stats.update(row[column])
+    return stats
+
+
+def partitioned_stats(partitions=4, column='age', batch_size=10000):
+    """StreamingStats of column, computed per key range and merged
+
+    Only the small per-partition summaries cross process boundaries.
+    """
+    options = _pool_options(get_pool())
+    with ProcessPoolExecutor(max_workers=partitions,
+                             initializer=_configure_worker_pool,
+                             initargs=(options,)) as executor:
+        futures = [executor.submit(_aggregate_worker, low, high, column, batch_size)
+                   for low, high in key_ranges(partitions)]
+        return merge_all(future.result() for future in futures)
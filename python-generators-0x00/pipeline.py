@@ -0,0 +1,185 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+from prefetch import prefetched
+
+EXECUTORS = ('inline', 'thread', 'process')
+
+
+def _chunks(items, size):
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _apply(fn, mode, chunk):
+    """Run one stage function over a chunk of items (in a worker)"""
+    if mode == 'map':
+        return [fn(item) for item in chunk]
+    return [item for item in chunk if fn(item)]
+
+
+def _run_inline(items, fn, mode):
+    if mode == 'map':
+        for item in items:
+            yield fn(item)
+    else:
+        for item in items:
+            if fn(item):
+                yield item
+
+
+def _run_pooled(items, fn, mode, executor, workers, chunksize, max_pending):
+    """Apply fn through a thread or process pool, keeping the input order
+
+    At most max_pending chunks are submitted ahead of the consumer, so a
+    slow consumer stops the stage from reading further input.
+    """
+    pool_class = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+    pool = pool_class(max_workers=workers)
+    pending = deque()
+    try:
+        for chunk in _chunks(items, chunksize):
+            pending.append(pool.submit(_apply, fn, mode, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+
+
+def _batch(items, size):
+    yield from _chunks(items, size)
+
+
+def _window(items, size, step):
+    window = deque(maxlen=size)
+    seen = 0
+    for item in items:
+        window.append(item)
+        seen += 1
+        if seen >= size and (seen - size) % step == 0:
+            yield tuple(window)
+
+
+def _flatten(items):
+    for item in items:
+        yield from item
+
+
+class Pipeline:
+    """A chain of generator stages: a source, then map / filter / batch /
+    window stages, consumed by iterating or by a sink
+
+    Stages are lazy: nothing is read from the source until the pipeline is
+    iterated, and every item flows through the whole chain one at a time.
+    map and filter run inline by default; executor='thread' or 'process'
+    spreads them over a pool of workers (process functions must be
+    picklable, i.e. defined at module level), sending chunksize items per
+    task and keeping the output in input order.
+
+    buffer=N on any stage runs everything up to that stage on a background
+    thread that works up to N items ahead through a bounded queue. Pooled
+    stages are buffered by default. A full queue blocks the stage feeding
+    it, so a slow consumer applies backpressure all the way to the source
+    and memory stays bounded.
+
+    Pipelines are immutable; each method returns a new, longer pipeline.
+    """
+
+    def __init__(self, source, stages=()):
+        self._source = source
+        self._stages = tuple(stages)
+
+    def _then(self, stage, buffer=0):
+        if buffer:
+            queued = lambda items: prefetched(items, buffer)
+            return Pipeline(self._source, self._stages + (stage, queued))
+        return Pipeline(self._source, self._stages + (stage,))
+
+    def _pooled_stage(self, fn, mode, executor, workers, chunksize, buffer, max_pending):
+        if executor not in EXECUTORS:
+            raise ValueError(f"executor must be one of {EXECUTORS}")
+        if executor == 'inline':
+            return self._then(lambda items: _run_inline(items, fn, mode), buffer)
+        workers = workers or os.cpu_count() or 1
+        max_pending = max_pending or 2 * workers
+        if buffer is None:
+            buffer = max_pending * chunksize
+        return self._then(lambda items: _run_pooled(items, fn, mode, executor, workers,
+                                                    chunksize, max_pending), buffer)
+
+    def map(self, fn, executor='inline', workers=None, chunksize=1, buffer=None,
+            max_pending=None):
+        """Replace every item with fn(item)
+
+        A pooled map keeps at most max_pending chunks (default 2 per worker)
+        in flight.
+        """
+        return self._pooled_stage(fn, 'map', executor, workers, chunksize, buffer,
+                                  max_pending)
+
+    def filter(self, predicate, executor='inline', workers=None, chunksize=1, buffer=None,
+               max_pending=None):
+        """Keep the items for which predicate(item) is true"""
+        return self._pooled_stage(predicate, 'filter', executor, workers, chunksize, buffer,
+                                  max_pending)
+
+    def batch(self, size, buffer=0):
+        """Group items into lists of size (the last one may be shorter)"""
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        return self._then(lambda items: _batch(items, size), buffer)
+
+    def window(self, size, step=1, buffer=0):
+        """Sliding windows: tuples of size consecutive items, every step items
+
+        step=size gives tumbling (non-overlapping) windows.
+        """
+        if size < 1 or step < 1:
+            raise ValueError("size and step must be at least 1")
+        return self._then(lambda items: _window(items, size, step), buffer)
+
+    def flatten(self, buffer=0):
+        """Turn a stream of batches back into a stream of items"""
+        return self._then(_flatten, buffer)
+
+    def buffer(self, depth):
+        """Run the pipeline so far on a background thread, depth items ahead"""
+        return self._then(lambda items: items, depth)
+
+    def __iter__(self):
+        items = self._source() if callable(self._source) else self._source
+        for stage in self._stages:
+            items = stage(items)
+        return iter(items)
+
+    def sink(self, fn=None, executor='inline', workers=None, chunksize=1):
+        """Consume the pipeline, calling fn on every item; returns the count"""
+        items = self if fn is None else self.map(fn, executor, workers, chunksize)
+        iterator = iter(items)
+        count = 0
+        try:
+            for _ in iterator:
+                count += 1
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+        return count
+
+
+def source(iterable_or_factory, *args, **kwargs):
+    """Start a pipeline from an iterable, or from a generator function
+    called with args each time the pipeline is iterated"""
+    if args or kwargs:
+        return Pipeline(lambda: iterable_or_factory(*args, **kwargs))
+    return Pipeline(iterable_or_factory)
@@ -0,0 +1,60 @@
+import queue
+import threading
+
+_DONE = object()
+
+
+def prefetched(iterable, depth=1):
+    """Generator yielding from iterable while a background thread reads ahead
+
+    The thread fetches item k+1 (up to depth items ahead) while the caller is
+    still working on item k, so fetch latency and processing time overlap
+    instead of adding up. The look-ahead queue is bounded by depth, so a
+    slow consumer pauses the thread rather than buffering the whole stream.
+
+    Closing the generator early (break, close() or garbage collection)
+    stops the thread and closes the underlying iterator from that thread,
+    which runs its cleanup, e.g. returning a pooled connection.
+    """
+    if depth < 1:
+        raise ValueError("depth must be at least 1")
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    break
+            else:
+                put((_DONE, None))
+        except BaseException as e:
+            put((_DONE, e))
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name='prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
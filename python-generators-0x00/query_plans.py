@@ -0,0 +1,133 @@
+import argparse
+import sys
+
+from connection_pool import configure_pool, get_pool
+from partitioned_scan import key_ranges, range_filter
+from sqlite_backend import SQLiteConnection
+from watermark import DEFAULT_SETTLE, changes_query
+
+# SQLite names the index behind a non-integer PRIMARY KEY itself
+SQLITE_PRIMARY_PREFIX = 'sqlite_autoindex_user_data_'
+
+
+class PlanError(AssertionError):
+    """A generator's query no longer runs the way its index was built for"""
+
+
+def access_paths(dialect='mysql'):
+    """[(name, query, params, index, covering), ...] for the generators
+
+    Each entry is the query a generator actually issues on dialect, the
+    index it must use (None for a full table scan) and whether that index
+    must cover the query (no table row reads).
+    """
+    over_25 = __import__('1-batch_processing').OVER_25
+    pages = __import__('2-lazy_paginate')
+    ages = __import__('4-stream_ages')
+    sample_id = b'\x80' + b'\x00' * 15
+    low, high = key_ranges(4)[1]
+    return [
+        ('stream_user_ages', ages.AGES_QUERY, (), 'age_index', True),
+        # age > 25 keeps about 90% of users, so no index beats reading the
+        # table. SQLite can't estimate range selectivity and still picks
+        # age_index
+        ('batch_processing',) + over_25.select('user_data')
+        + (None if dialect == 'mysql' else 'age_index', False),
+        ('lazy_paginate', pages.PAGE_AFTER_QUERY, (sample_id, 1000), 'PRIMARY', False),
+        ('partitioned_scan',)
+        + range_filter(low, high).select('user_data', order_by='user_id')
+        + ('PRIMARY', False),
+        # With the settle clause, as stream_users_in_batches issues it
+        ('stream_changes',)
+        + changes_query('user_data', ('2000-01-01 00:00:00', sample_id),
+                        settle=DEFAULT_SETTLE, dialect=dialect)
+        + ('updated_index', False),
+    ]
+
+
+def _dialect(connection):
+    return 'sqlite' if isinstance(connection, SQLiteConnection) else 'mysql'
+
+
+def explain(cursor, query, params=(), dialect='mysql'):
+    """Plan of query as (index used or None, covered, raw plan rows)"""
+    if dialect == 'sqlite':
+        cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+        plan = cursor.fetchall()
+        for row in plan:
+            detail = row[-1]
+            if ' INDEX ' in detail:
+                index = detail.split(' INDEX ', 1)[1].split(' ', 1)[0]
+                if index.startswith(SQLITE_PRIMARY_PREFIX):
+                    index = 'PRIMARY'
+                return index, 'COVERING INDEX' in detail, plan
+            if 'PRIMARY KEY' in detail:
+                return 'PRIMARY', False, plan
+        return None, False, plan
+
+    cursor.execute(f"EXPLAIN {query}", params)
+    names = [column[0].lower() for column in cursor.description]
+    plan = [dict(zip(names, row)) for row in cursor.fetchall()]
+    for row in plan:
+        if row.get('table') == 'user_data':
+            extra = row.get('extra') or ''
+            if isinstance(extra, (bytes, bytearray)):
+                extra = extra.decode()
+            # type ALL is a full table scan whatever key is reported
+            index = row.get('key') if row.get('type') != 'ALL' else None
+            return index, 'Using index' in extra, plan
+    return None, False, plan
+
+
+def check_plan(cursor, query, params, index, covering=False, dialect='mysql'):
+    """Raise PlanError unless query uses index (and is covered by it)"""
+    used, covered, plan = explain(cursor, query, params, dialect)
+    if used != index:
+        raise PlanError(f"expected index {index}, plan uses {used or 'a full scan'}: {plan}")
+    if covering and not covered:
+        raise PlanError(f"index {index} no longer covers the query: {plan}")
+    return plan
+
+
+def verify_plans(names=None):
+    """Check every generator's access path against its index
+
+    Returns [(name, error or None), ...]; names limits the check to some
+    access paths.
+    """
+    results = []
+    with get_pool().connection() as connection:
+        dialect = _dialect(connection)
+        cursor = connection.cursor()
+        try:
+            for name, query, params, index, covering in access_paths(dialect):
+                if names and name not in names:
+                    continue
+                try:
+                    check_plan(cursor, query, params, index, covering, dialect)
+                    results.append((name, None))
+                except PlanError as e:
+                    results.append((name, str(e)))
+        finally:
+            cursor.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Fail if a generator's query stops using its index")
+    parser.add_argument('names', nargs='*', help="access paths to check (default: all)")
+    parser.add_argument('--sqlite-path', help="check a SQLite dataset instead of MySQL")
+    args = parser.parse_args(argv)
+    if args.sqlite_path:
+        configure_pool(connect=lambda: SQLiteConnection(args.sqlite_path))
+
+    failed = 0
+    for name, error in verify_plans(args.names):
+        print(f"{name}: {'ok' if error is None else 'FAILED - ' + error}")
+        failed += error is not None
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
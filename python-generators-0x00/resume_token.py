@@ -0,0 +1,24 @@
+import base64
+
+
+def encode_resume_token(user_id):
+    """Turn the last seen user_id (bytes or hex string) into an opaque token"""
+    if isinstance(user_id, str):
+        user_id = bytes.fromhex(user_id)
+    return base64.urlsafe_b64encode(user_id).decode('ascii').rstrip('=')
+
+
+def decode_resume_token(token):
+    """Recover the binary user_id stored in a resume token"""
+    padding = '=' * (-len(token) % 4)
+    try:
+        return base64.urlsafe_b64decode(token + padding)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid resume token: {token!r}")
+
+
+def page_token(page):
+    """Resume token pointing just past the last user of page"""
+    if not page:
+        return None
+    return encode_resume_token(page[-1]['user_id'])
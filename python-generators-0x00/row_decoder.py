@@ -0,0 +1,104 @@
+import functools
+from collections import namedtuple
+
+# Columns stored as BINARY(16) UUIDs and handed out as hex strings
+UUID_COLUMNS = ('user_id',)
+
+_record_types = {}
+
+
+def record_type(names):
+    """Compact, immutable record class for rows with the given columns
+
+    Records are namedtuples (no per-row __dict__), but also accept
+    record['age'] so code written against dict rows keeps working.
+    """
+    names = tuple(names)
+    if names not in _record_types:
+        base = namedtuple('UserRecord', names)
+
+        class UserRecord(base):
+            __slots__ = ()
+
+            def __getitem__(self, key):
+                if isinstance(key, str):
+                    try:
+                        return getattr(self, key)
+                    except AttributeError:
+                        raise KeyError(key) from None
+                return tuple.__getitem__(self, key)
+
+            def __contains__(self, key):
+                return key in self._fields
+
+            def keys(self):
+                return self._fields
+
+            def get(self, key, default=None):
+                return getattr(self, key, default) if isinstance(key, str) else default
+
+        _record_types[names] = UserRecord
+    return _record_types[names]
+
+
+class RowDecoder:
+    """Row conversion worked out once per query from the cursor description
+
+    Instead of checking every row for a user_id key and its type, the
+    positions of the UUID columns are resolved up front, so decoding a row
+    is a dict(zip(...)) or tuple build plus one hex() per UUID column.
+    """
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.record_type = record_type(self.names)
+        names = self.names
+        uuids = [(index, name) for index, name in enumerate(names) if name in UUID_COLUMNS]
+        new_record = functools.partial(tuple.__new__, self.record_type)
+
+        if not uuids:
+            self.to_dict = lambda row: dict(zip(names, row))
+            self.to_record = new_record
+        elif len(uuids) == 1:
+            # The usual case: only user_id needs converting
+            [(position, name)] = uuids
+            after = position + 1
+
+            def to_dict(row):
+                user = dict(zip(names, row))
+                value = row[position]
+                if isinstance(value, bytes):
+                    user[name] = value.hex()
+                return user
+
+            def to_record(row):
+                value = row[position]
+                if not isinstance(value, bytes):
+                    return new_record(row)
+                return new_record(row[:position] + (value.hex(),) + row[after:])
+
+            self.to_dict = to_dict
+            self.to_record = to_record
+        else:
+            def values(row):
+                row = list(row)
+                for index, _ in uuids:
+                    if isinstance(row[index], bytes):
+                        row[index] = row[index].hex()
+                return row
+
+            self.to_dict = lambda row: dict(zip(names, values(row)))
+            self.to_record = lambda row: new_record(values(row))
+
+    @classmethod
+    def from_cursor(cls, cursor):
+        """Build a decoder from a cursor that has executed its query"""
+        return cls(column[0] for column in cursor.description)
+
+    def decoder(self, records=False):
+        """The per-row function: to_record when records is true, else to_dict"""
+        return self.to_record if records else self.to_dict
+
+    def decode_many(self, rows, records=False):
+        decode = self.decoder(records)
+        return [decode(row) for row in rows]
@@ -1,7 +1,40 @@
 import mysql.connector
 import uuid
 import csv
+import json
+import os
+import sqlite3
+import tempfile
+import time
 from mysql.connector import Error
+from age_summary import create_summary_tables, rebuild_summary, write_tracked
+from sqlite_backend import SQLiteConnection
+
+# Loader errors from either backend load_data supports
+DB_ERRORS = (Error, sqlite3.Error)
+
+USER_COLUMNS = ('user_id', 'name', 'email', 'age')
+
+# Secondary indexes on user_data, one per generator access path (see
+# query_plans.py, which checks the generators' queries still use them)
+USER_DATA_INDEXES = {
+    # stream_user_ages and the pushed-down age aggregates read only age
+    'age_index': ('age',),
+    # incremental streaming in (updated_at, user_id) keyset order
+    'updated_index': ('updated_at', 'user_id'),
+}
+
+# Indexes older versions created and migrate_indexes drops. age_covering_index
+# copied every column for batch_processing's age > 25 filter, which keeps
+# about 90% of users, so reading it was no cheaper than scanning the table
+# while every insert paid for a second copy of the row
+RETIRED_INDEXES = ('age_covering_index',)
+
+# Current time in the format SQLite stores updated_at in
+SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+# Errors meaning LOAD DATA LOCAL INFILE is disabled on the client or server
+LOCAL_INFILE_DISABLED = (1148, 2068, 3948)
 
 def connect_db():
     """Connect to the MySQL database server"""
@@ -32,7 +65,8 @@ def connect_to_prodev():
             host='localhost',
             user='root',  # Replace with your MySQL username
             password='',  # Replace with your MySQL password
-            database='ALX_prodev'
+            database='ALX_prodev',
+            allow_local_infile=True  # Lets load_data use LOAD DATA LOCAL INFILE
         )
         return connection
     except Error as e:
@@ -41,37 +75,329 @@ def connect_to_prodev():
 
 def create_table(connection):
     """Create table user_data if it doesn't exist with required fields"""
+    indexes = ',\n            '.join(f"INDEX {name} ({', '.join(columns)})"
+                                      for name, columns in USER_DATA_INDEXES.items())
     try:
         cursor = connection.cursor()
-        cursor.execute("""
+        cursor.execute(f"""
         CREATE TABLE IF NOT EXISTS user_data (
             user_id BINARY(16) PRIMARY KEY,
             name VARCHAR(255) NOT NULL,
             email VARCHAR(255) NOT NULL,
             age DECIMAL(3,1) NOT NULL,
-            UNIQUE INDEX email_index (email)
+            updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+                ON UPDATE CURRENT_TIMESTAMP(6),
+            UNIQUE INDEX email_index (email),
+            {indexes}
         )
         """)
         print("Table user_data created successfully or already exists")
+        migrate_updated_at(cursor)
+        migrate_indexes(cursor)
+        # Maintained count/sum/histogram of ages, see age_summary.py
+        create_summary_tables(cursor)
+        connection.commit()
     except Error as e:
         print(f"Error creating table: {e}")
 
+def migrate_updated_at(cursor):
+    """Add updated_at and its index to a user_data table created before them
+
+    updated_at is maintained by MySQL itself: set on insert and bumped on
+    every update that changes the row, including upserts, which is what
+    incremental streaming (see watermark.py) relies on. Existing rows get
+    the time of the migration.
+    """
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data' "
+        "AND COLUMN_NAME = 'updated_at'"
+    )
+    if cursor.fetchone()[0]:
+        return
+    cursor.execute(
+        "ALTER TABLE user_data "
+        "ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) "
+        "ON UPDATE CURRENT_TIMESTAMP(6), "
+        "ADD INDEX updated_index (updated_at, user_id)"
+    )
+    print("Added updated_at to user_data")
+
+def migrate_indexes(cursor):
+    """Add any of USER_DATA_INDEXES a user_data table is missing and drop
+    RETIRED_INDEXES"""
+    cursor.execute(
+        "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data'"
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+    for name, columns in USER_DATA_INDEXES.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE user_data ADD INDEX {name} ({', '.join(columns)})")
+            print(f"Added index {name} to user_data")
+    for name in RETIRED_INDEXES:
+        if name in existing:
+            cursor.execute(f"ALTER TABLE user_data DROP INDEX {name}")
+            print(f"Dropped index {name} from user_data")
+
+def csv_row_to_record(row):
+    """Turn one CSV row (a dict) into a (user_id, name, email, age) tuple"""
+    # Convert UUID string to binary for storage
+    user_uuid = uuid.UUID(row['user_id']).bytes if row.get('user_id') else uuid.uuid4().bytes
+    return (
+        user_uuid,
+        row['name'],
+        row['email'],
+        float(row['age'])
+    )
+
 def read_csv_data(filename):
     """Read data from CSV file and prepare for insertion"""
     data = []
     with open(filename, mode='r') as file:
         csv_reader = csv.DictReader(file)
         for row in csv_reader:
-            # Convert UUID string to binary for storage
-            user_uuid = uuid.UUID(row['user_id']).bytes if 'user_id' in row else uuid.uuid4().bytes
-            data.append((
-                user_uuid,
-                row['name'],
-                row['email'],
-                float(row['age'])
-            ))
+            data.append(csv_row_to_record(row))
     return data
 
+def read_csv_chunks_from(filename, chunk_size=10000, offset=None, rejected=None):
+    """Generator yielding (chunk, end_offset) pairs from a CSV file
+
+    chunk is a list of at most chunk_size records and end_offset is the
+    file position just after its last row, so passing it back as offset
+    continues with the next row. Rows that can't be parsed are skipped and,
+    when a list is passed as rejected, appended to it as
+    (line_number, row, error).
+    """
+    with open(filename, mode='r', newline='') as file:
+        # readline() (unlike iterating the file) keeps tell() usable
+        lines = iter(file.readline, '')
+        fieldnames = next(csv.reader(lines), None)
+        if fieldnames is None:
+            return
+        if offset:
+            file.seek(offset)
+        csv_reader = csv.DictReader(lines, fieldnames=fieldnames)
+        chunk = []
+        for row in csv_reader:
+            try:
+                chunk.append(csv_row_to_record(row))
+            except (KeyError, TypeError, ValueError) as e:
+                if rejected is not None:
+                    rejected.append((csv_reader.line_num, row, str(e)))
+                continue
+            if len(chunk) >= chunk_size:
+                yield chunk, file.tell()
+                chunk = []
+        if chunk:
+            yield chunk, file.tell()
+
+def read_csv_chunks(filename, chunk_size=10000, rejected=None):
+    """Generator yielding the CSV as lists of at most chunk_size records
+
+    Only one chunk is held in memory at a time.
+    """
+    for chunk, _ in read_csv_chunks_from(filename, chunk_size, rejected=rejected):
+        yield chunk
+
+def read_checkpoint(path, filename):
+    """Return the committed CSV offset recorded in a checkpoint file, or 0"""
+    try:
+        with open(path) as file:
+            checkpoint = json.load(file)
+    except FileNotFoundError:
+        return 0
+    if checkpoint.get('filename') != os.path.abspath(filename):
+        raise ValueError(f"Checkpoint {path} belongs to {checkpoint.get('filename')}")
+    return checkpoint['offset']
+
+def write_checkpoint(path, filename, offset, rows):
+    """Atomically record that everything before offset has been committed"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump({'filename': os.path.abspath(filename), 'offset': offset,
+                   'rows': rows}, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+def _escape_infile_field(value):
+    """Escape a value for LOAD DATA's default tab-separated format"""
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+def _dialect(connection):
+    if isinstance(connection, (sqlite3.Connection, SQLiteConnection)):
+        return 'sqlite'
+    return 'mysql'
+
+def insert_chunk_infile(cursor, chunk, upsert=False):
+    """Bulk load one chunk with LOAD DATA LOCAL INFILE via a temp file
+
+    With upsert=True the chunk is loaded into a temporary staging table and
+    merged with INSERT ... SELECT ... ON DUPLICATE KEY UPDATE, so users
+    that already exist (by user_id or email) are updated in place: they
+    keep their user_id, and updated_at only moves when a value changed.
+    LOAD DATA's own REPLACE would delete and re-insert them instead.
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False) as tmp:
+        for user_id, name, email, age in chunk:
+            tmp.write(f"{user_id.hex()}\t{_escape_infile_field(name)}\t"
+                      f"{_escape_infile_field(email)}\t{age}\n")
+    try:
+        if upsert:
+            # No keys on the staging table: duplicates are resolved by the merge
+            cursor.execute(
+                "CREATE TEMPORARY TABLE IF NOT EXISTS user_data_staging ("
+                "user_id BINARY(16) NOT NULL, name VARCHAR(255) NOT NULL, "
+                "email VARCHAR(255) NOT NULL, age DECIMAL(3,1) NOT NULL)"
+            )
+            cursor.execute("DELETE FROM user_data_staging")
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE '{tmp.name}' "
+            f"INTO TABLE {'user_data_staging' if upsert else 'user_data'} "
+            "(@user_id, name, email, age) SET user_id = UNHEX(@user_id)"
+        )
+        if upsert:
+            columns = ', '.join(USER_COLUMNS)
+            cursor.execute(
+                f"INSERT INTO user_data ({columns}) "
+                f"SELECT {columns} FROM user_data_staging{upsert_clause('mysql')}"
+            )
+    finally:
+        os.unlink(tmp.name)
+
+def upsert_clause(dialect):
+    """SQL appended to an INSERT to update rows that already exist
+
+    MySQL's ON DUPLICATE KEY UPDATE fires on the primary key and on the
+    unique email index alike; SQLite needs one ON CONFLICT per unique key.
+    Either way updated_at only moves for rows whose values changed.
+    """
+    if dialect == 'sqlite':
+        # SQLite has no ON UPDATE, so the upsert bumps updated_at itself
+        update = ("DO UPDATE SET name = excluded.name, email = excluded.email, "
+                  f"age = excluded.age, updated_at = {SQLITE_NOW} "
+                  "WHERE name IS NOT excluded.name OR email IS NOT excluded.email "
+                  "OR age IS NOT excluded.age")
+        return f" ON CONFLICT(user_id) {update} ON CONFLICT(email) {update}"
+    return (" ON DUPLICATE KEY UPDATE name = VALUES(name), email = VALUES(email), "
+            "age = VALUES(age)")
+
+def insert_chunk_multirow(cursor, chunk, rows_per_statement=1000, upsert=False,
+                          dialect='mysql'):
+    """Insert one chunk with multi-row INSERT statements"""
+    marker = '?' if dialect == 'sqlite' else '%s'
+    row_placeholder = f"({', '.join([marker] * len(USER_COLUMNS))})"
+    suffix = upsert_clause(dialect) if upsert else ''
+    for start in range(0, len(chunk), rows_per_statement):
+        rows = chunk[start:start + rows_per_statement]
+        placeholders = ', '.join([row_placeholder] * len(rows))
+        cursor.execute(
+            f"INSERT INTO user_data ({', '.join(USER_COLUMNS)}) VALUES {placeholders}{suffix}",
+            [value for row in rows for value in row]
+        )
+
+def load_data(connection, filename, chunk_size=10000, method='auto',
+              upsert=False, checkpoint=None, summary=True):
+    """Stream a CSV file into user_data, committing every chunk
+
+    method is 'infile' (LOAD DATA LOCAL INFILE), 'insert' (multi-row
+    INSERT) or 'auto', which tries LOAD DATA and falls back to INSERT when
+    the server or client has local_infile disabled (SQLite always uses
+    INSERT). A chunk that fails is rolled back on its own; chunks committed
+    before it are kept.
+
+    Without upsert a populated table is left alone, as before. upsert=True
+    loads into a populated table and updates users that already exist, so
+    loading the same file twice is harmless. checkpoint names a file that
+    records the CSV offset after every committed chunk; a later call with
+    the same checkpoint resumes from there instead of starting over. The
+    checkpoint is written after the commit, so a crash in between replays
+    one committed chunk; loads with a checkpoint therefore always upsert,
+    which makes that replay harmless.
+
+    Each chunk also updates the maintained age summary (age_summary.py) in
+    its own transaction; summary=False skips that for tables without the
+    summary tables.
+
+    Returns a dict with rows loaded, rows rejected, failed chunks and rows/s.
+    """
+    if method not in ('auto', 'infile', 'insert'):
+        raise ValueError("method must be 'auto', 'infile' or 'insert'")
+    dialect = _dialect(connection)
+    if dialect == 'sqlite':
+        method = 'insert'
+    if checkpoint:
+        # A replayed chunk would otherwise fail on duplicate keys every rerun
+        upsert = True
+    result = {'rows': 0, 'rejected': 0, 'failed_chunks': 0, 'method': method}
+    rejected = []
+    start = time.perf_counter()
+    try:
+        offset = read_checkpoint(checkpoint, filename) if checkpoint else 0
+        cursor = connection.cursor()
+
+        # Check if data already exists
+        if not upsert and not offset:
+            cursor.execute("SELECT COUNT(*) FROM user_data")
+            if cursor.fetchone()[0] > 0:
+                print("Data already exists in the table")
+                return result
+        if offset:
+            print(f"Resuming {filename} from byte {offset}")
+
+        def write_chunk(chunk):
+            nonlocal method
+            if method in ('auto', 'infile'):
+                try:
+                    insert_chunk_infile(cursor, chunk, upsert)
+                    result['method'] = 'infile'
+                except Error as e:
+                    if method == 'infile' or getattr(e, 'errno', None) not in LOCAL_INFILE_DISABLED:
+                        raise
+                    print(f"LOAD DATA LOCAL INFILE unavailable ({e}), using INSERT")
+                    method = 'insert'
+            if method == 'insert':
+                insert_chunk_multirow(cursor, chunk, upsert=upsert, dialect=dialect)
+                result['method'] = 'insert'
+
+        for chunk, end_offset in read_csv_chunks_from(filename, chunk_size, offset, rejected):
+            try:
+                if summary:
+                    # The age summary changes in the same transaction as the rows
+                    write_tracked(cursor, chunk, lambda: write_chunk(chunk), dialect,
+                                  inserts_only=method == 'insert' and not upsert)
+                else:
+                    write_chunk(chunk)
+                connection.commit()
+                result['rows'] += len(chunk)
+            except DB_ERRORS as e:
+                connection.rollback()
+                result['failed_chunks'] += 1
+                print(f"Error inserting chunk after {result['rows']} rows: {e}")
+                if checkpoint:
+                    # Don't checkpoint past rows that were never committed
+                    print(f"Stopping; rerun to resume from {checkpoint}")
+                    break
+                continue
+            if checkpoint:
+                write_checkpoint(checkpoint, filename, end_offset, result['rows'])
+    except DB_ERRORS as e:
+        print(f"Error loading data: {e}")
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+
+    for line_num, row, error in rejected:
+        print(f"Skipped CSV line {line_num}: {error}")
+    result['rejected'] = len(rejected)
+    result['seconds'] = time.perf_counter() - start
+    result['rows_per_second'] = result['rows'] / result['seconds'] if result['seconds'] else 0.0
+    print(f"Loaded {result['rows']} records in {result['seconds']:.1f}s "
+          f"({result['rows_per_second']:.0f} rows/s)")
+    return result
+
 def insert_data(connection, data):
     """Insert data into the database if it doesn't exist"""
     try:
@@ -88,7 +414,8 @@ def insert_data(connection, data):
         INSERT INTO user_data (user_id, name, email, age)
         VALUES (%s, %s, %s, %s)
         """
-        cursor.executemany(insert_query, data)
+        write_tracked(cursor, data, lambda: cursor.executemany(insert_query, data),
+                      _dialect(connection), inserts_only=True)
         connection.commit()
         print(f"Inserted {cursor.rowcount} records successfully")
     except Error as e:
@@ -97,6 +424,26 @@ def insert_data(connection, data):
         if connection.is_connected():
             cursor.close()
 
+def load_csv(filename, chunk_size=10000, method='auto', truncate=False):
+    """Connect to ALX_prodev, make sure user_data exists and load filename
+
+    truncate=True empties user_data first, e.g. between benchmark runs.
+    """
+    connection = connect_to_prodev()
+    if not connection:
+        return None
+    try:
+        create_table(connection)
+        if truncate:
+            cursor = connection.cursor()
+            cursor.execute("TRUNCATE TABLE user_data")
+            rebuild_summary(cursor)
+            connection.commit()
+            cursor.close()
+        return load_data(connection, filename, chunk_size, method)
+    finally:
+        connection.close()
+
 def main():
     # Step 1: Connect to MySQL server
     connection = connect_db()
@@ -115,9 +462,10 @@ def main():
     # Step 4: Create table
     create_table(connection)
     
-    # Step 5: Read and insert data
-    data = read_csv_data('user_data.csv')  # Replace with your CSV file path
-    insert_data(connection, data)
+    # Step 5: Stream the CSV into the table in committed chunks; the
+    # checkpoint lets an interrupted load resume where it stopped
+    load_data(connection, 'user_data.csv',  # Replace with your CSV file path
+              upsert=True, checkpoint='user_data.csv.checkpoint')
     
     # Clean up
     connection.close()
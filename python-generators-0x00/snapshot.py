@@ -0,0 +1,194 @@
+import argparse
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+MAGIC = b'USERSNP1'
+# magic, row count, then (offset, length) for each section
+HEADER = struct.Struct('<8sQ' + 'QQ' * 6)
+SECTIONS = ('user_id', 'age', 'name_offsets', 'name', 'email_offsets', 'email')
+ALIGNMENT = 8
+
+# Ages are DECIMAL(3,1), stored exactly as little-endian int16 tenths
+AGE_TYPECODE = 'h'
+OFFSET_TYPECODE = 'q'
+
+
+def _little_endian(values):
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+class _ColumnWriter:
+    """Spools one column to a temporary file while the export streams"""
+
+    def __init__(self, directory):
+        self.file = tempfile.TemporaryFile(dir=directory)
+        self.length = 0
+
+    def write(self, data):
+        self.file.write(data)
+        self.length += len(data)
+
+
+def export_snapshot(path, batch_size=10000, batches=None):
+    """Write user_data to a memory-mappable columnar snapshot file
+
+    Columns are streamed to temporary files batch by batch, so memory stays
+    bounded, then laid out back to back after a fixed header: 16-byte
+    user_ids, int16 ages (tenths), and names and emails as UTF-8 blobs with
+    int64 offset arrays. The file is written under a temporary name and
+    renamed into place, so readers never see a partial snapshot.
+    batches defaults to stream_users_in_batches(batch_size, records=True).
+    Returns the number of users written.
+    """
+    if batches is None:
+        batches = __import__('1-batch_processing').stream_users_in_batches(
+            batch_size, records=True)
+    directory = os.path.dirname(os.path.abspath(path))
+    columns = {name: _ColumnWriter(directory) for name in SECTIONS}
+    text_ends = {'name': 0, 'email': 0}
+    for name in text_ends:
+        columns[f'{name}_offsets'].write(_little_endian(array(OFFSET_TYPECODE, [0])).tobytes())
+
+    count = 0
+    for batch in batches:
+        if batch is None:
+            raise RuntimeError("Database error while exporting the snapshot")
+        if not batch:
+            continue
+        columns['user_id'].write(b''.join(bytes.fromhex(user['user_id']) for user in batch))
+        ages = array(AGE_TYPECODE, (int(round(float(user['age']) * 10)) for user in batch))
+        columns['age'].write(_little_endian(ages).tobytes())
+        for name in text_ends:
+            encoded = [user[name].encode('utf-8') for user in batch]
+            ends = array(OFFSET_TYPECODE)
+            for value in encoded:
+                text_ends[name] += len(value)
+                ends.append(text_ends[name])
+            columns[name].write(b''.join(encoded))
+            columns[f'{name}_offsets'].write(_little_endian(ends).tobytes())
+        count += len(batch)
+
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as out:
+            out.write(b'\0' * HEADER.size)
+            layout = []
+            for name in SECTIONS:
+                out.write(b'\0' * (-out.tell() % ALIGNMENT))
+                layout += [out.tell(), columns[name].length]
+                columns[name].file.seek(0)
+                shutil.copyfileobj(columns[name].file, out)
+            out.seek(0)
+            out.write(HEADER.pack(MAGIC, count, *layout))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        for column in columns.values():
+            column.file.close()
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return count
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a snapshot file
+
+    ages and user_ids are memoryviews straight onto the mapped pages: no
+    data is copied until a value is actually read, and repeated scans are
+    served from the OS page cache.
+    """
+
+    def __init__(self, path):
+        if sys.byteorder != 'little':
+            raise NotImplementedError("Snapshots are only mapped on little-endian hosts")
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        fields = HEADER.unpack_from(self._mmap, 0)
+        if fields[0] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a user_data snapshot")
+        self.count = fields[1]
+        self._views = []
+        sections = {}
+        for index, name in enumerate(SECTIONS):
+            offset, length = fields[2 + 2 * index], fields[3 + 2 * index]
+            sections[name] = self._view(offset, length)
+        self.user_ids = sections['user_id']
+        self.ages = sections['age'].cast(AGE_TYPECODE)
+        self._text = {
+            name: (sections[f'{name}_offsets'].cast(OFFSET_TYPECODE), sections[name])
+            for name in ('name', 'email')
+        }
+        self._views += [self.ages] + [view for pair in self._text.values() for view in pair]
+
+    def _view(self, offset, length):
+        view = memoryview(self._mmap)[offset:offset + length]
+        self._views.append(view)
+        return view
+
+    def user_id(self, index):
+        return self.user_ids[index * 16:(index + 1) * 16].hex()
+
+    def text(self, name, index):
+        offsets, blob = self._text[name]
+        return str(blob[offsets[index]:offsets[index + 1]], 'utf-8')
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def snapshot_ages(path):
+    """Generator yielding every age in the snapshot, like stream_user_ages"""
+    with Snapshot(path) as snapshot:
+        for tenths in snapshot.ages:
+            yield tenths / 10
+
+
+def snapshot_users(path):
+    """Generator yielding users from the snapshot, like stream_users"""
+    with Snapshot(path) as snapshot:
+        for index in range(snapshot.count):
+            yield {
+                'user_id': snapshot.user_id(index),
+                'name': snapshot.text('name', index),
+                'email': snapshot.text('email', index),
+                'age': snapshot.ages[index] / 10,
+            }
+
+
+def snapshot_average_age(path):
+    """Average age computed directly over the mapped age column"""
+    with Snapshot(path) as snapshot:
+        if not snapshot.count:
+            return 0
+        return sum(snapshot.ages) / 10 / snapshot.count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export user_data to a columnar snapshot")
+    parser.add_argument('path')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args(argv)
+    count = export_snapshot(args.path, args.batch_size)
+    print(f"Wrote {count} users to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import sqlite3
+
+
+class SQLiteCursor:
+    """sqlite3 cursor accepting the %s placeholders used by the generators"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, query, params=()):
+        self._cursor.execute(query.replace('%s', '?'), tuple(params))
+
+    def executemany(self, query, seq_of_params):
+        self._cursor.executemany(query.replace('%s', '?'), seq_of_params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """A SQLite database behind the small part of the mysql.connector
+    connection API the generators use, so ConnectionPool can hand it out
+
+    Rows are plain tuples, as from a default mysql.connector cursor; the
+    buffered/dictionary cursor options are accepted and ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._open = True
+
+    def cursor(self, buffered=None, dictionary=False):
+        if dictionary:
+            raise NotImplementedError("SQLiteConnection only returns tuple rows")
+        return SQLiteCursor(self._connection.cursor())
+
+    def is_connected(self):
+        return self._open
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._open = False
+        self._connection.close()
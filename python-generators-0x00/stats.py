@@ -0,0 +1,190 @@
+import math
+
+
+class HistogramSketch:
+    """Fixed-width histogram used to answer percentile queries
+
+    Memory is bounded by the number of bins, not by how many values were
+    seen, and two sketches with the same layout merge exactly by adding
+    their counts. Percentiles are accurate to one bin width; the defaults
+    (0.1 wide bins over [0, 100)) match the DECIMAL(3,1) age column, so ages
+    come back exactly.
+    """
+
+    def __init__(self, low=0.0, high=100.0, bin_width=0.1):
+        if high <= low or bin_width <= 0:
+            raise ValueError("Need low < high and a positive bin_width")
+        self.low = low
+        self.high = high
+        self.bin_width = bin_width
+        self.bins = [0] * int(math.ceil((high - low) / bin_width - 1e-9))
+        # Values outside [low, high) are kept in two overflow buckets
+        self.below = 0
+        self.above = 0
+
+    def _layout(self):
+        return (self.low, self.high, self.bin_width)
+
+    def add(self, value, count=1):
+        if value < self.low:
+            self.below += count
+        elif value >= self.high:
+            self.above += count
+        else:
+            # Round before truncating so 25.3 lands in bin 253, not 252
+            index = int(round((value - self.low) / self.bin_width, 6))
+            self.bins[min(index, len(self.bins) - 1)] += count
+
+    def merge(self, other):
+        if self._layout() != other._layout():
+            raise ValueError("Cannot merge histograms with different layouts")
+        self.bins = [a + b for a, b in zip(self.bins, other.bins)]
+        self.below += other.below
+        self.above += other.above
+        return self
+
+    def quantile(self, q, minimum=None, maximum=None):
+        """Value below which a fraction q of the data lies (nearest rank)"""
+        total = self.below + sum(self.bins) + self.above
+        if total == 0:
+            return None
+        rank = max(1, math.ceil(q * total))
+        if rank <= self.below:
+            return minimum if minimum is not None else self.low
+        cumulative = self.below
+        for index, count in enumerate(self.bins):
+            cumulative += count
+            if cumulative >= rank:
+                return round(self.low + index * self.bin_width, 10)
+        return maximum if maximum is not None else self.high
+
+
+class StreamingStats:
+    """One-pass, mergeable count / mean / variance / min / max / percentiles
+
+    Mean and variance use Welford's update and merge with Chan's parallel
+    formula, so statistics gathered on separate partitions combine into the
+    same result as a single pass over all the data.
+    """
+
+    def __init__(self, low=0.0, high=100.0, bin_width=0.1):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        self.sketch = HistogramSketch(low, high, bin_width)
+
+    def update(self, value):
+        """Add one value; None (the generators' error marker) is ignored"""
+        if value is None:
+            return self
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.sketch.add(value)
+        return self
+
+    def update_many(self, values):
+        for value in values:
+            self.update(value)
+        return self
+
+    def merge(self, other):
+        """Fold another StreamingStats into this one"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self._m2 = other.count, other.mean, other._m2
+        else:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / count
+            self._m2 += other._m2 + delta * delta * self.count * other.count / count
+            self.count = count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def variance(self):
+        """Population variance"""
+        return self._m2 / self.count if self.count else None
+
+    @property
+    def stddev(self):
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+    def percentile(self, p):
+        """Approximate p-th percentile (0-100), accurate to one bin width"""
+        if not 0 <= p <= 100:
+            raise ValueError("p must be between 0 and 100")
+        return self.sketch.quantile(p / 100, self.min, self.max)
+
+    def summary(self, percentiles=(50, 90, 95, 99)):
+        result = {
+            'count': self.count,
+            'mean': self.mean if self.count else None,
+            'variance': self.variance,
+            'stddev': self.stddev,
+            'min': self.min,
+            'max': self.max,
+        }
+        for p in percentiles:
+            result[f'p{p:g}'] = self.percentile(p)
+        return result
+
+
+def stats_of(values):
+    """StreamingStats of one batch of values, e.g. in a worker process"""
+    return StreamingStats().update_many(values)
+
+
+def merge_all(partials):
+    """Merge an iterable of StreamingStats into a new one"""
+    partials = list(partials)
+    if not partials:
+        return StreamingStats()
+    sketch = partials[0].sketch
+    merged = StreamingStats(sketch.low, sketch.high, sketch.bin_width)
+    for partial in partials:
+        merged.merge(partial)
+    return merged
+
+
+def sql_summary(cursor, column, table, where="", params=()):
+    """Compute count / mean / variance / min / max inside the database
+
+    Only the exact, cheap aggregates are pushed down; percentiles need a
+    pass over the data. SUM over a DECIMAL column is exact in MySQL and the
+    variance is derived from it in Decimal arithmetic, so the usual float
+    cancellation of the sum-of-squares formula does not apply.
+    """
+    cursor.execute(
+        f"SELECT COUNT({column}), SUM({column}), SUM({column} * {column}), "
+        f"MIN({column}), MAX({column}) FROM {table}{where}",
+        tuple(params)
+    )
+    count, total, total_sq, minimum, maximum = cursor.fetchone()
+    if not count:
+        return {'count': 0, 'mean': None, 'variance': None, 'stddev': None,
+                'min': None, 'max': None}
+    mean = total / count
+    # Subtract in exact (Decimal) arithmetic before converting to float
+    variance = max(float(total_sq / count - mean * mean), 0.0)
+    return {
+        'count': count,
+        'mean': float(mean),
+        'variance': variance,
+        'stddev': math.sqrt(variance),
+        'min': float(minimum),
+        'max': float(maximum),
+    }
@@ -0,0 +1,120 @@
+import argparse
+import random
+import uuid
+
+from age_summary import create_summary_tables, rebuild_summary, write_tracked
+from seed import (SQLITE_NOW, USER_DATA_INDEXES, connect_to_prodev, create_table,
+                  insert_chunk_multirow)
+from sqlite_backend import SQLiteConnection
+
+SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id BLOB PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE,
+    age NUMERIC NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT ({SQLITE_NOW})
+)
+"""
+
+SQLITE_INDEXES = tuple(
+    f"CREATE INDEX IF NOT EXISTS {name} ON user_data ({', '.join(columns)})"
+    for name, columns in USER_DATA_INDEXES.items()
+)
+
+
+def generate_users(rows, seed=0):
+    """Generator of reproducible (user_id, name, email, age) records
+
+    The same seed always produces the same users; user_ids are random
+    version 4 UUIDs as 16 raw bytes, ages are 18.0-99.9 in 0.1 steps.
+    """
+    generator = random.Random(seed)
+    for i in range(rows):
+        user_id = uuid.UUID(int=generator.getrandbits(128), version=4).bytes
+        yield (user_id, f"User {i}", f"user{i}@example.com",
+               generator.randint(180, 999) / 10)
+
+
+def _chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def populate(connection, rows, seed=0, chunk_size=10000, dialect='mysql'):
+    """Insert rows synthetic users into user_data, committing every chunk
+
+    The maintained age summary is updated along with every chunk.
+    """
+    cursor = connection.cursor()
+    try:
+        for chunk in _chunks(generate_users(rows, seed), chunk_size):
+            write_tracked(cursor, chunk,
+                          lambda: insert_chunk_multirow(cursor, chunk, dialect=dialect),
+                          dialect, inserts_only=True)
+            connection.commit()
+    finally:
+        cursor.close()
+    return rows
+
+
+def create_sqlite_dataset(path, rows, seed=0):
+    """Create (or replace) a SQLite file holding rows synthetic users"""
+    connection = SQLiteConnection(path)
+    try:
+        cursor = connection.cursor()
+        for table in ('user_data', 'user_age_summary', 'user_age_histogram'):
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(SQLITE_SCHEMA)
+        for statement in SQLITE_INDEXES:
+            cursor.execute(statement)
+        create_summary_tables(cursor, 'sqlite')
+        connection.commit()
+        cursor.close()
+        populate(connection, rows, seed, dialect='sqlite')
+    finally:
+        connection.close()
+    return path
+
+
+def create_mysql_dataset(rows, seed=0):
+    """Replace the contents of ALX_prodev.user_data with synthetic users"""
+    connection = connect_to_prodev()
+    if not connection:
+        return None
+    try:
+        create_table(connection)
+        cursor = connection.cursor()
+        cursor.execute("TRUNCATE TABLE user_data")
+        rebuild_summary(cursor)
+        connection.commit()
+        cursor.close()
+        return populate(connection, rows, seed)
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic user_data table")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sqlite', metavar='PATH',
+                        help="write a SQLite file instead of filling MySQL")
+    args = parser.parse_args(argv)
+
+    if args.sqlite:
+        create_sqlite_dataset(args.sqlite, args.rows, args.seed)
+        print(f"Wrote {args.rows} users to {args.sqlite}")
+    else:
+        create_mysql_dataset(args.rows, args.seed)
+        print(f"Loaded {args.rows} users into ALX_prodev.user_data")
+
+
+if __name__ == "__main__":
+    main()
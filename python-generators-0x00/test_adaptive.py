@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Unit tests for adaptive batch sizing"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from adaptive import AdaptiveBatchSizer
+from connection_pool import configure_pool
+from sqlite_backend import SQLiteConnection
+from synthetic import create_sqlite_dataset
+
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+lazy_paginate = __import__('2-lazy_paginate').lazy_paginate
+
+
+class TestAdaptiveBatchSizer(unittest.TestCase):
+    """Test the sizer's bounds and its response to fetch timings"""
+
+    def test_starting_at_small_size(self):
+        """Test sizes below the default min_size are accepted"""
+        for size in (1, 5, 10):
+            with self.subTest(size=size):
+                sizer = AdaptiveBatchSizer.starting_at(size)
+                self.assertEqual(sizer.batch_size, size)
+                self.assertEqual(sizer.min_size, size)
+
+    def test_starting_at_large_size(self):
+        """Test sizes above the default max_size are accepted"""
+        sizer = AdaptiveBatchSizer.starting_at(500000)
+        self.assertEqual(sizer.max_size, 500000)
+
+    def test_invalid_initial(self):
+        """Test explicit bounds still reject an initial size outside them"""
+        with self.assertRaises(ValueError):
+            AdaptiveBatchSizer(initial=5, min_size=10)
+
+    def test_steps_are_damped(self):
+        """Test a fast fetch at most doubles and a slow one at most halves"""
+        sizer = AdaptiveBatchSizer(initial=1000, target_latency=0.2)
+        self.assertEqual(sizer.observe(1000, 0.0001), 2000)
+        sizer = AdaptiveBatchSizer(initial=1000, target_latency=0.2)
+        self.assertEqual(sizer.observe(1000, 100), 500)
+
+
+class TestAdaptiveStreams(unittest.TestCase):
+    """Test adaptive=True with the generators' own small example sizes"""
+
+    def setUp(self):
+        """Create a SQLite dataset"""
+        self.directory = tempfile.mkdtemp()
+        path = create_sqlite_dataset(os.path.join(self.directory, 'users.db'), 300)
+        self.pool = configure_pool(connect=lambda: SQLiteConnection(path))
+
+    def tearDown(self):
+        """Close the pool and remove the dataset"""
+        self.pool.close()
+        shutil.rmtree(self.directory)
+
+    def test_small_sizes(self):
+        """Test a page or batch size below 10 reads every user"""
+        self.assertEqual(sum(len(page) for page in lazy_paginate(5, adaptive=True)), 300)
+        self.assertEqual(sum(len(batch) for batch in
+                             stream_users_in_batches(3, adaptive=True)), 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Unit tests for the maintained age summary"""
+
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+from unittest.mock import patch
+from age_summary import read_summary, recompute, write_tracked
+from seed import load_data
+from sqlite_backend import SQLiteConnection
+from synthetic import create_sqlite_dataset
+
+
+class TestSummaryDelta(unittest.TestCase):
+    """Test that tracked writes keep the summary equal to a recompute"""
+
+    def setUp(self):
+        """Create a SQLite dataset with its summary tables"""
+        self.directory = tempfile.mkdtemp()
+        path = create_sqlite_dataset(os.path.join(self.directory, 'users.db'), 300)
+        self.connection = SQLiteConnection(path)
+        self.cursor = self.connection.cursor()
+        printing = patch('builtins.print')
+        printing.start()
+        self.addCleanup(printing.stop)
+
+    def tearDown(self):
+        """Close the database and remove it"""
+        self.connection.close()
+        shutil.rmtree(self.directory)
+
+    def existing(self, count):
+        """The first count stored users as (user_id, name, email, age)"""
+        self.cursor.execute("SELECT user_id, name, email, age FROM user_data "
+                            "ORDER BY user_id LIMIT %s", (count,))
+        return self.cursor.fetchall()
+
+    def write_csv(self, records):
+        """Write (user_id or None, name, email, age) records to a CSV file"""
+        filename = os.path.join(self.directory, 'users.csv')
+        with open(filename, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['user_id', 'name', 'email', 'age'])
+            for user_id, name, email, age in records:
+                writer.writerow([str(uuid.UUID(bytes=user_id)) if user_id else '',
+                                 name, email, age])
+        return filename
+
+    def assert_summary_consistent(self):
+        """The maintained summary equals one recomputed from user_data"""
+        self.assertEqual(read_summary(self.cursor), recompute(self.cursor))
+
+    def test_fresh_dataset(self):
+        """Test the summary built with the dataset matches user_data"""
+        self.assert_summary_consistent()
+
+    def test_upsert_changed_and_new_users(self):
+        """Test upserting changed ages, unchanged rows and new users"""
+        rows = self.existing(20)
+        records = [(user_id, name, email, float(age) + 1.5)
+                   for user_id, name, email, age in rows[:10]]
+        records += rows[10:]
+        records += [(None, f"New {i}", f"new{i}@example.com", 30 + i / 10)
+                    for i in range(10)]
+
+        result = load_data(self.connection, self.write_csv(records), chunk_size=7,
+                           upsert=True)
+
+        self.assertEqual(result['failed_chunks'], 0)
+        self.assertEqual(recompute(self.cursor)[0], 310)
+        self.assert_summary_consistent()
+
+    def test_upsert_email_collision(self):
+        """Test a new user_id whose email exists updates the stored user"""
+        (_, name, email, age), = self.existing(1)
+        load_data(self.connection, self.write_csv([(uuid.uuid4().bytes, name, email, 77.7)]),
+                  upsert=True)
+
+        self.assertEqual(recompute(self.cursor)[0], 300)
+        self.assert_summary_consistent()
+
+    def test_replace_deleting_two_rows(self):
+        """Test a REPLACE colliding with two users on user_id and email"""
+        (first_id, _, _, _), (_, _, second_email, _) = self.existing(2)
+        chunk = [(first_id, 'Merged', second_email, 42.0)]
+
+        write_tracked(self.cursor, chunk, lambda: self.cursor.executemany(
+            "REPLACE INTO user_data (user_id, name, email, age) "
+            "VALUES (%s, %s, %s, %s)", chunk), 'sqlite')
+        self.connection.commit()
+
+        self.assertEqual(recompute(self.cursor)[0], 299)
+        self.assert_summary_consistent()
+
+    def test_rolled_back_write(self):
+        """Test a rolled back chunk leaves rows and summary unchanged"""
+        before = recompute(self.cursor)
+        chunk = [(uuid.uuid4().bytes, 'Gone', 'gone@example.com', 50.0)]
+
+        write_tracked(self.cursor, chunk, lambda: self.cursor.executemany(
+            "INSERT INTO user_data (user_id, name, email, age) "
+            "VALUES (%s, %s, %s, %s)", chunk), 'sqlite', inserts_only=True)
+        self.connection.rollback()
+
+        self.assertEqual(recompute(self.cursor), before)
+        self.assert_summary_consistent()
+
+
+if __name__ == '__main__':
+    unittest.main()
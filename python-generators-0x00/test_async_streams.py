@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Unit tests for the asyncio streaming generators, run on aiosqlite"""
+
+import asyncio
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+from async_streams import (AioSQLiteSource, alazy_paginate, astream_users,
+                           astream_users_in_batches, prefetch)
+from resume_token import page_token
+from synthetic import create_sqlite_dataset
+
+
+class TrackingSource(AioSQLiteSource):
+    """AioSQLiteSource counting the connections it opens and closes"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.opened = 0
+        self.open = 0
+
+    @asynccontextmanager
+    async def connect(self):
+        self.opened += 1
+        self.open += 1
+        try:
+            async with super().connect() as connection:
+                yield connection
+        finally:
+            self.open -= 1
+
+
+async def collect(agen, limit=None):
+    """Up to limit items of agen, closing it afterwards"""
+    items = []
+    try:
+        async for item in agen:
+            items.append(item)
+            if limit is not None and len(items) == limit:
+                break
+    finally:
+        await agen.aclose()
+    return items
+
+
+class AsyncStreamsTestCase(unittest.TestCase):
+    """Shared SQLite dataset for the async stream tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Create a small SQLite dataset"""
+        cls.directory = tempfile.mkdtemp()
+        cls.path = create_sqlite_dataset(os.path.join(cls.directory, 'users.db'), 250)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the dataset"""
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        """A source that counts its connections"""
+        self.source = TrackingSource(self.path)
+
+
+class TestAsyncBatches(AsyncStreamsTestCase):
+    """Test batches and single users streamed from the source"""
+
+    def test_batches_hold_every_user(self):
+        """Test batches of batch_size cover every user once"""
+        batches = asyncio.run(collect(astream_users_in_batches(100, self.source)))
+        self.assertEqual([len(batch) for batch in batches], [100, 100, 50])
+        user_ids = {user['user_id'] for batch in batches for user in batch}
+        self.assertEqual(len(user_ids), 250)
+        self.assertEqual(self.source.open, 0)
+
+    def test_users_match_batches(self):
+        """Test astream_users yields the users of the batches in order"""
+        batches = asyncio.run(collect(astream_users_in_batches(64, self.source)))
+        users = asyncio.run(collect(astream_users(self.source, fetch_size=64)))
+        self.assertEqual(users, [user for batch in batches for user in batch])
+
+    def test_database_error_yields_none(self):
+        """Test a failing query prints the error and yields a single None"""
+        empty = os.path.join(self.directory, 'empty.db')
+        with patch('builtins.print') as printed:
+            batches = asyncio.run(collect(
+                astream_users_in_batches(10, AioSQLiteSource(empty))))
+        self.assertEqual(batches, [None])
+        self.assertIn("Database error", printed.call_args[0][0])
+
+
+class TestAsyncPagination(AsyncStreamsTestCase):
+    """Test keyset pages and resuming from a token"""
+
+    def test_pages_in_user_id_order_over_one_connection(self):
+        """Test every page is read, in order, over a single connection"""
+        pages = asyncio.run(collect(alazy_paginate(40, self.source)))
+        self.assertEqual([len(page) for page in pages], [40] * 6 + [10])
+        user_ids = [user['user_id'] for page in pages for user in page]
+        self.assertEqual(user_ids, sorted(user_ids))
+        self.assertEqual(self.source.opened, 1)
+        self.assertEqual(self.source.open, 0)
+
+    def test_resume_token_continues_the_walk(self):
+        """Test resuming after page 2 yields exactly the remaining pages"""
+        pages = asyncio.run(collect(alazy_paginate(40, self.source)))
+        token = page_token(pages[1])
+        resumed = asyncio.run(collect(alazy_paginate(40, self.source, resume_token=token)))
+        self.assertEqual(resumed, pages[2:])
+
+    def test_resume_without_mysql_driver(self):
+        """Test resuming imports nothing that needs mysql.connector"""
+        pages = asyncio.run(collect(alazy_paginate(100, self.source)))
+        # Reimport without any module that may have pulled in the driver
+        fresh = [name for name in ('async_streams', 'resume_token', 'row_decoder',
+                                   '2-lazy_paginate') if name in sys.modules]
+        with patch.dict(sys.modules, {'mysql': None, 'mysql.connector': None}):
+            for name in fresh:
+                del sys.modules[name]
+            module = importlib.import_module('async_streams')
+            resumed = asyncio.run(collect(module.alazy_paginate(
+                100, module.AioSQLiteSource(self.path), resume_token=page_token(pages[0]))))
+        self.assertEqual(resumed, pages[1:])
+
+
+class TestAsyncCancellation(AsyncStreamsTestCase):
+    """Test closing a prefetching stream early"""
+
+    def test_aclose_cancels_producer_and_closes_connection(self):
+        """Test aclose() after one batch leaves no task or connection open"""
+        async def main():
+            stream = astream_users_in_batches(10, self.source, prefetch_depth=2)
+            first = await stream.__anext__()
+            await stream.aclose()
+            others = asyncio.all_tasks() - {asyncio.current_task()}
+            return first, others, self.source.open
+
+        first, others, still_open = asyncio.run(main())
+        self.assertEqual(len(first), 10)
+        self.assertEqual(others, set())
+        self.assertEqual(still_open, 0)
+
+    def test_break_out_of_pages(self):
+        """Test leaving a paginated walk early closes its connection at once"""
+        async def main():
+            pages = await collect(alazy_paginate(10, self.source, prefetch_depth=2),
+                                  limit=2)
+            # Checked before asyncio.run finalizes any leftover generators
+            return pages, self.source.open
+
+        pages, still_open = asyncio.run(main())
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(still_open, 0)
+
+    def test_prefetch_reraises_errors(self):
+        """Test an exception in the producer reaches the consumer"""
+        async def failing():
+            yield 1
+            raise ValueError("boom")
+
+        async def main():
+            return await collect(prefetch(failing(), 2))
+
+        with self.assertRaises(ValueError):
+            asyncio.run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Unit tests for columnar batches"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+from columnar import infer_dtype, to_columns, to_structured, widen_dtype
+from connection_pool import configure_pool
+from filters import Column, Filter, In
+from sqlite_backend import SQLiteConnection
+from synthetic import create_sqlite_dataset
+
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+
+NAMES = ('user_id', 'name', 'age')
+# About 1 in 256 random UUIDs ends in a NUL byte
+NUL_KEY = bytes(range(1, 16)) + b'\x00'
+OTHER_KEY = bytes(range(2, 18))
+
+
+class TestStructured(unittest.TestCase):
+    """Test row tuples are converted without losing or narrowing values"""
+
+    def test_key_ending_in_nul_is_kept(self):
+        """Test a binary key ending in 0x00 keeps all 16 bytes"""
+        array = to_structured(NAMES, [(NUL_KEY, 'a', 30), (OTHER_KEY, 'b', 40)])
+        self.assertEqual(bytes(array['user_id'][0]), NUL_KEY)
+        self.assertEqual(len(bytes(array['user_id'][0])), 16)
+        self.assertEqual(bytes(to_columns(array)['user_id'][1]), OTHER_KEY)
+
+    def test_filters_compare_binary_keys(self):
+        """Test masks on a binary key column match the raw keys"""
+        columns = to_columns(to_structured(NAMES, [(NUL_KEY, 'a', 30),
+                                                   (OTHER_KEY, 'b', 40)]))
+        self.assertEqual(list(Filter(Column('user_id') == NUL_KEY).predicate.mask(columns)),
+                         [True, False])
+        self.assertEqual(list(Filter(Column('user_id') > NUL_KEY).predicate.mask(columns)),
+                         [False, True])
+        self.assertEqual(list(In('user_id', [OTHER_KEY]).mask(columns)), [False, True])
+
+    def test_mixed_numbers_become_float(self):
+        """Test a column mixing ints and floats is float64, not truncated"""
+        array = to_structured(NAMES, [(NUL_KEY, 'a', 61), (OTHER_KEY, 'b', 25.5)])
+        self.assertEqual(array.dtype['age'], 'f8')
+        self.assertEqual(list(array['age']), [61.0, 25.5])
+
+    def test_binary_of_varying_width_is_object(self):
+        """Test binary values of different lengths are kept as Python bytes"""
+        dtype = infer_dtype(NAMES, [(b'ab\x00', 'a', 1), (b'ab', 'b', 2)])
+        self.assertEqual(dtype['user_id'], object)
+
+    def test_widen_dtype(self):
+        """Test a later batch widens, never narrows, the stream's dtype"""
+        ints = infer_dtype(NAMES, [(NUL_KEY, 'a', 30)])
+        floats = infer_dtype(NAMES, [(NUL_KEY, 'a', 30.5)])
+        self.assertEqual(widen_dtype(ints, floats)['age'], 'f8')
+        self.assertEqual(widen_dtype(floats, ints)['age'], 'f8')
+        self.assertEqual(widen_dtype(ints, ints), ints)
+        self.assertEqual(to_structured(NAMES, [(NUL_KEY, 'a', 30)], floats)['age'][0], 30.0)
+
+
+class TestColumnarStream(unittest.TestCase):
+    """Test columnar batches read from a database keep every user_id"""
+
+    def setUp(self):
+        """Create a dataset with one user_id ending in a NUL byte"""
+        self.directory = tempfile.mkdtemp()
+        path = create_sqlite_dataset(os.path.join(self.directory, 'users.db'), 200)
+        connection = SQLiteConnection(path)
+        cursor = connection.cursor()
+        cursor.execute("SELECT user_id FROM user_data")
+        self.keys = {row[0] for row in cursor.fetchall()}
+        cursor.execute("INSERT INTO user_data (user_id, name, email, age) "
+                       "VALUES (%s, %s, %s, %s)",
+                       (NUL_KEY, 'Nul Key', f"{uuid.uuid4()}@example.com", 33))
+        connection.commit()
+        connection.close()
+        self.keys.add(NUL_KEY)
+        self.pool = configure_pool(connect=lambda: SQLiteConnection(path))
+
+    def tearDown(self):
+        """Close the pool and remove the dataset"""
+        self.pool.close()
+        shutil.rmtree(self.directory)
+
+    def test_user_ids_round_trip(self):
+        """Test every streamed user_id equals a stored key"""
+        for mode in ('columns', 'structured'):
+            with self.subTest(columnar=mode):
+                keys = set()
+                for batch in stream_users_in_batches(64, columnar=mode):
+                    keys.update(bytes(value) for value in batch['user_id'])
+                self.assertEqual(keys, self.keys)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Unit tests for pipeline"""
+
+import threading
+import unittest
+from pipeline import EXECUTORS, source
+
+
+def square(number):
+    """Module level, so process workers can unpickle it"""
+    return number * number
+
+
+def is_even(number):
+    """Module level, so process workers can unpickle it"""
+    return number % 2 == 0
+
+
+def _reciprocal(number):
+    """Module level, so process workers can unpickle it"""
+    return 1 / number
+
+
+class CountingSource:
+    """Generator source recording how far it was read and whether it was closed"""
+
+    def __init__(self, size):
+        self.size = size
+        self.read = 0
+        self.closed = threading.Event()
+
+    def __call__(self):
+        try:
+            for number in range(self.size):
+                self.read += 1
+                yield number
+        finally:
+            self.closed.set()
+
+
+class TestPipelineStages(unittest.TestCase):
+    """Test stage order and results for every executor"""
+
+    def test_map_then_filter(self):
+        """Test map runs before a later filter, in input order"""
+        expected = [n * n for n in range(200) if (n * n) % 2 == 0]
+        for executor in EXECUTORS:
+            with self.subTest(executor=executor):
+                pipeline = (source(range(200))
+                            .map(square, executor=executor, workers=2, chunksize=7)
+                            .filter(is_even))
+                self.assertEqual(list(pipeline), expected)
+
+    def test_filter_then_map(self):
+        """Test filter runs before a later map, in input order"""
+        expected = [n * n for n in range(200) if n % 2 == 0]
+        for executor in EXECUTORS:
+            with self.subTest(executor=executor):
+                pipeline = (source(range(200))
+                            .filter(is_even, executor=executor, workers=3, chunksize=5)
+                            .map(square))
+                self.assertEqual(list(pipeline), expected)
+
+    def test_batch_window_flatten(self):
+        """Test batch, window and flatten reshape the stream"""
+        self.assertEqual(list(source(range(7)).batch(3)), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(list(source(range(5)).window(3)),
+                         [(0, 1, 2), (1, 2, 3), (2, 3, 4)])
+        self.assertEqual(list(source(range(6)).window(2, step=2)),
+                         [(0, 1), (2, 3), (4, 5)])
+        self.assertEqual(list(source(range(7)).batch(3).flatten()), list(range(7)))
+
+    def test_factory_source_is_read_per_iteration(self):
+        """Test a generator function source restarts on every iteration"""
+        pipeline = source(lambda: iter(range(3))).map(square)
+        self.assertEqual(list(pipeline), [0, 1, 4])
+        self.assertEqual(list(pipeline), [0, 1, 4])
+
+    def test_sink_counts_items(self):
+        """Test sink consumes the pipeline and calls fn on every item"""
+        seen = []
+        self.assertEqual(source(range(10)).filter(is_even).sink(seen.append), 5)
+        self.assertEqual(seen, [0, 2, 4, 6, 8])
+
+    def test_unknown_executor(self):
+        """Test an unknown executor is rejected"""
+        with self.assertRaises(ValueError):
+            source(range(3)).map(square, executor='fiber')
+
+
+class TestPipelineEarlyClose(unittest.TestCase):
+    """Test closing a pipeline early stops and closes its source"""
+
+    def test_close_stops_reading_and_closes_source(self):
+        """Test a closed pipeline read only a bounded prefix of its source"""
+        for executor in EXECUTORS:
+            with self.subTest(executor=executor):
+                counting = CountingSource(100000)
+                iterator = iter(source(counting)
+                                .map(square, executor=executor, workers=2, chunksize=4,
+                                     max_pending=2))
+                self.assertEqual([next(iterator) for _ in range(3)], [0, 1, 4])
+                iterator.close()
+
+                self.assertTrue(counting.closed.wait(5))
+                # max_pending chunks in flight plus the buffer in front of them
+                self.assertLess(counting.read, 100)
+
+    def test_break_closes_buffered_stage(self):
+        """Test leaving a for loop over a buffered pipeline closes the source"""
+        counting = CountingSource(100000)
+        for number in source(counting).buffer(5).map(square):
+            if number > 10:
+                break
+        self.assertTrue(counting.closed.wait(5))
+        self.assertLess(counting.read, 100)
+
+    def test_worker_error_propagates(self):
+        """Test an exception in a pooled stage reaches the consumer"""
+        for executor in ('thread', 'process'):
+            with self.subTest(executor=executor):
+                pipeline = source([1, 2, 0, 4]).map(_reciprocal, executor=executor,
+                                                    workers=2)
+                with self.assertRaises(ZeroDivisionError):
+                    list(pipeline)
+
+
+if __name__ == '__main__':
+    unittest.main()
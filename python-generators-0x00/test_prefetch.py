@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Unit tests for prefetched streams and their pooled connections"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from mysql.connector import Error
+from connection_pool import configure_pool
+from prefetch import prefetched
+from sqlite_backend import SQLiteConnection, SQLiteCursor
+from synthetic import create_sqlite_dataset
+
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+
+
+class UnreadResultCursor(SQLiteCursor):
+    """Cursor that, like an unbuffered mysql.connector cursor, refuses to
+    close while rows of its result are still unread"""
+
+    unread = False
+
+    def execute(self, query, params=()):
+        super().execute(query, params)
+        self.unread = True
+
+    def fetchone(self):
+        row = super().fetchone()
+        self.unread = row is not None
+        return row
+
+    def fetchmany(self, size=1):
+        rows = super().fetchmany(size)
+        self.unread = bool(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self.unread = False
+        return rows
+
+    def close(self):
+        if self.unread:
+            raise Error("Unread result found")
+        super().close()
+
+
+class UnreadResultConnection(SQLiteConnection):
+    """SQLite connection handing out UnreadResultCursors"""
+
+    def cursor(self, buffered=None, dictionary=False):
+        return UnreadResultCursor(self._connection.cursor())
+
+
+class TestPrefetched(unittest.TestCase):
+    """Test class for prefetched"""
+
+    def test_yields_items_in_order(self):
+        """Test the read-ahead thread doesn't reorder or drop items"""
+        self.assertEqual(list(prefetched(range(100), depth=3)), list(range(100)))
+
+    def test_reraises_source_errors(self):
+        """Test an exception in the source reaches the consumer"""
+        def failing():
+            yield 1
+            raise ValueError("boom")
+
+        stream = prefetched(failing())
+        self.assertEqual(next(stream), 1)
+        with self.assertRaises(ValueError):
+            next(stream)
+
+    def test_close_closes_source_on_its_thread(self):
+        """Test closing early stops the thread and runs the source's cleanup"""
+        closed_on = []
+
+        def source():
+            try:
+                while True:
+                    yield 1
+            finally:
+                closed_on.append(threading.current_thread().name)
+
+        stream = prefetched(source(), depth=2)
+        next(stream)
+        stream.close()
+        self.assertEqual(closed_on, ['prefetch'])
+        self.assertFalse(any(thread.name == 'prefetch' and thread.is_alive()
+                             for thread in threading.enumerate()))
+
+
+class TestPrefetchReleasesConnection(unittest.TestCase):
+    """Test that cancelled prefetching streams give their connection back"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Create a small SQLite dataset"""
+        cls.directory = tempfile.mkdtemp()
+        cls.path = create_sqlite_dataset(os.path.join(cls.directory, 'users.db'), 500)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the dataset"""
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        """Use a pool of a single connection, so a leak blocks the next checkout"""
+        self.pool = configure_pool(max_size=1, timeout=1,
+                                   connect=lambda: SQLiteConnection(self.path))
+
+    def tearDown(self):
+        """Close the pool's idle connections"""
+        self.pool.close()
+
+    def assert_connection_returned(self):
+        """The single pooled connection can be checked out again"""
+        connection = self.pool.acquire()
+        self.pool.release(connection)
+
+    def test_close_releases_connection(self):
+        """Test close() after one batch returns the pooled connection"""
+        stream = stream_users_in_batches(10, prefetch=2)
+        self.assertEqual(len(next(stream)), 10)
+        stream.close()
+        self.assert_connection_returned()
+
+    def test_break_releases_connection(self):
+        """Test leaving a for loop early returns the pooled connection"""
+        for batch in stream_users_in_batches(10, prefetch=2):
+            break
+        self.assert_connection_returned()
+
+    def test_full_stream_matches_unprefetched(self):
+        """Test prefetching yields the same batches as a plain stream"""
+        plain = [batch for batch in stream_users_in_batches(50)]
+        ahead = [batch for batch in stream_users_in_batches(50, prefetch=3)]
+        self.assertEqual(ahead, plain)
+        self.assert_connection_returned()
+
+
+class TestPrefetchUnreadResult(TestPrefetchReleasesConnection):
+    """Rerun the release tests against cursors that can't close half read"""
+
+    def setUp(self):
+        """Use a single connection whose cursors refuse to close half read"""
+        self.pool = configure_pool(max_size=1, timeout=1,
+                                   connect=lambda: UnreadResultConnection(self.path))
+        # Any exception escaping the prefetch thread fails the test
+        self.thread_errors = []
+        excepthook = patch('threading.excepthook', self.thread_errors.append)
+        excepthook.start()
+        self.addCleanup(excepthook.stop)
+
+    def tearDown(self):
+        """Check the prefetch thread raised nothing, then close the pool"""
+        self.assertEqual(self.thread_errors, [])
+        super().tearDown()
+
+    def test_early_close_discards_connection(self):
+        """Test an abandoned stream drops its connection and frees the slot"""
+        for prefetch in (0, 2):
+            with self.subTest(prefetch=prefetch):
+                before = self.pool.stats()
+                stream = stream_users_in_batches(10, prefetch=prefetch)
+                next(stream)
+                stream.close()
+
+                stats = self.pool.stats()
+                self.assertEqual(stats['discarded'], before['discarded'] + 1)
+                self.assertEqual(stats['idle'], 0)
+                self.assert_connection_returned()
+
+    def test_repeated_early_close(self):
+        """Test more abandoned streams than max_size don't exhaust the pool"""
+        for _ in range(3):
+            stream = stream_users_in_batches(10, prefetch=2)
+            next(stream)
+            stream.close()
+        self.assertEqual(sum(len(batch) for batch in stream_users_in_batches(100)), 500)
+
+    def test_exhausted_stream_keeps_connection(self):
+        """Test a stream read to the end returns its connection for reuse"""
+        list(stream_users_in_batches(100, prefetch=2))
+        list(stream_users_in_batches(100, prefetch=2))
+        stats = self.pool.stats()
+        self.assertEqual((stats['opened'], stats['discarded'], stats['idle']), (1, 0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
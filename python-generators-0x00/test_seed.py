@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Unit tests for resumable CSV loading"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import seed
+from age_summary import read_summary, recompute
+from benchmark import write_synthetic_csv
+from sqlite_backend import SQLiteConnection
+from synthetic import create_sqlite_dataset
+
+
+class Crash(BaseException):
+    """Stands in for the process dying; not caught by load_data"""
+
+
+class TestCheckpointedLoad(unittest.TestCase):
+    """Test a load interrupted between commit and checkpoint resumes"""
+
+    def setUp(self):
+        """Create an empty SQLite user_data and a CSV of 1000 users"""
+        self.directory = tempfile.mkdtemp()
+        path = create_sqlite_dataset(os.path.join(self.directory, 'users.db'), 0)
+        self.connection = SQLiteConnection(path)
+        self.csv = os.path.join(self.directory, 'users.csv')
+        write_synthetic_csv(self.csv, 1000)
+        self.checkpoint = os.path.join(self.directory, 'users.csv.checkpoint')
+        printing = patch('builtins.print')
+        printing.start()
+        self.addCleanup(printing.stop)
+
+    def tearDown(self):
+        """Close the database and remove it"""
+        self.connection.close()
+        shutil.rmtree(self.directory)
+
+    def count_users(self):
+        """Rows in user_data"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM user_data")
+        return cursor.fetchone()[0]
+
+    def test_crash_after_commit_resumes(self):
+        """Test a chunk committed but not checkpointed is replayed harmlessly"""
+        write_checkpoint = seed.write_checkpoint
+        written = []
+
+        def crash_on_third(*args):
+            if len(written) == 2:
+                raise Crash()
+            written.append(args)
+            write_checkpoint(*args)
+
+        with patch('seed.write_checkpoint', crash_on_third):
+            with self.assertRaises(Crash):
+                seed.load_data(self.connection, self.csv, chunk_size=100,
+                               checkpoint=self.checkpoint)
+        self.assertEqual(self.count_users(), 300)
+
+        result = seed.load_data(self.connection, self.csv, chunk_size=100,
+                                checkpoint=self.checkpoint)
+
+        self.assertEqual(result['failed_chunks'], 0)
+        self.assertEqual(self.count_users(), 1000)
+        cursor = self.connection.cursor()
+        self.assertEqual(read_summary(cursor), recompute(cursor))
+
+    def test_finished_load_is_not_repeated(self):
+        """Test rerunning a completed checkpointed load adds nothing"""
+        seed.load_data(self.connection, self.csv, chunk_size=300,
+                       checkpoint=self.checkpoint)
+        result = seed.load_data(self.connection, self.csv, chunk_size=300,
+                                checkpoint=self.checkpoint)
+        self.assertEqual(result['rows'], 0)
+        self.assertEqual(self.count_users(), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Unit tests for incremental streaming with watermarks"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from connection_pool import configure_pool
+from seed import insert_chunk_multirow
+from sqlite_backend import SQLiteConnection
+from synthetic import create_sqlite_dataset
+from watermark import WatermarkStore
+
+batch_processing_module = __import__('1-batch_processing')
+stream_users_in_batches = batch_processing_module.stream_users_in_batches
+
+
+class TestWatermarkStream(unittest.TestCase):
+    """Test acknowledgement order and redelivery of change batches"""
+
+    def setUp(self):
+        """Create a SQLite dataset and an empty watermark store"""
+        self.directory = tempfile.mkdtemp()
+        self.path = create_sqlite_dataset(os.path.join(self.directory, 'users.db'), 250)
+        self.pool = configure_pool(connect=lambda: SQLiteConnection(self.path))
+        # settle=0: the dataset was just written, so nothing has settled yet
+        self.store = WatermarkStore(os.path.join(self.directory, 'watermark.json'),
+                                    settle=0)
+
+    def tearDown(self):
+        """Close the pool and remove the dataset"""
+        self.pool.close()
+        shutil.rmtree(self.directory)
+
+    def stream(self, batch_size=100):
+        """Batches of the next incremental stream, without acknowledging"""
+        return list(stream_users_in_batches(batch_size, watermark=self.store))
+
+    def update_ages(self, count):
+        """Change the age of count users, which bumps their updated_at"""
+        connection = SQLiteConnection(self.path)
+        cursor = connection.cursor()
+        cursor.execute("SELECT user_id, name, email, age FROM user_data LIMIT %s", (count,))
+        rows = [(user_id, name, email, float(age) + 1)
+                for user_id, name, email, age in cursor.fetchall()]
+        # updated_at has millisecond resolution; move past the last stamp
+        time.sleep(0.01)
+        insert_chunk_multirow(cursor, rows, upsert=True, dialect='sqlite')
+        connection.commit()
+        connection.close()
+        return {user_id.hex() for user_id, _, _, _ in rows}
+
+    def test_acknowledged_batches_are_not_streamed_again(self):
+        """Test a fully acknowledged stream leaves nothing to stream"""
+        batches = self.stream()
+        self.assertEqual(sum(len(batch) for batch in batches), 250)
+        for batch in batches:
+            batch.ack()
+        self.assertEqual(self.stream(), [])
+
+    def test_unacknowledged_batches_are_redelivered(self):
+        """Test the batches after the last ack come back in the next stream"""
+        first, second, third = self.stream()
+        first.ack()
+        redelivered = self.stream()
+        self.assertEqual(redelivered, [second, third])
+
+    def test_acks_must_be_in_order(self):
+        """Test acknowledging a later batch first raises ValueError"""
+        first, second, _ = self.stream()
+        with self.assertRaises(ValueError):
+            second.ack()
+        first.ack()
+        first.ack()  # acknowledging twice is harmless
+        second.ack()
+        self.assertEqual(self.store.get(), second.watermark)
+
+    def test_changed_rows_are_streamed_after_ack(self):
+        """Test rows updated after the watermark make up the next stream"""
+        for batch in self.stream():
+            batch.ack()
+        changed = self.update_ages(5)
+        batches = self.stream()
+        self.assertEqual({user['user_id'] for batch in batches for user in batch}, changed)
+
+    def test_unsettled_changes_are_held_back(self):
+        """Test rows younger than settle seconds are not streamed yet"""
+        store = WatermarkStore(self.store.path, settle=60)
+        self.assertEqual(list(stream_users_in_batches(100, watermark=store)), [])
+
+    def test_filtered_batches_acknowledge_the_stream(self):
+        """Test batch_processing's filtered batches move the watermark"""
+        for batch in batch_processing_module.batch_processing(
+                100, pushdown=False, watermark=self.store):
+            self.assertTrue(all(user['age'] > 25 for user in batch))
+            batch.ack()
+        self.assertEqual(self.stream(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from filters import _identifier
+
+# Rows are ordered by this (timestamp, tie-breaker) pair; the index
+# updated_index in seed.create_table covers it
+WATERMARK_COLUMNS = ('updated_at', 'user_id')
+
+# Seconds a change must age before it is streamed (see WatermarkStore)
+DEFAULT_SETTLE = 5.0
+
+
+def _serialize(watermark):
+    updated_at, user_id = watermark
+    if isinstance(updated_at, datetime):
+        updated_at = updated_at.isoformat(' ', 'microseconds')
+    if isinstance(user_id, (bytes, bytearray)):
+        user_id = bytes(user_id).hex()
+    return {'updated_at': updated_at, 'user_id': user_id}
+
+
+def _deserialize(entry):
+    return (entry['updated_at'], bytes.fromhex(entry['user_id']))
+
+
+class WatermarkStore:
+    """Committed position of an incremental stream, kept in a JSON file
+
+    A watermark is the (updated_at, user_id) of the last row a consumer has
+    finished with; the next incremental stream starts just after it. One
+    file can hold watermarks for several named streams. Writes go through
+    a temporary file and os.replace, so a crash never leaves a torn file.
+
+    updated_at is stamped when a statement runs, not when its transaction
+    commits, so a row can become visible with an updated_at behind a
+    watermark that has already been committed, and would then never be
+    streamed. To close that gap streams only read rows whose updated_at is
+    at least settle seconds old by the database's clock. Any transaction
+    open for less than settle seconds has committed by then. Keep writers'
+    transactions (e.g. seed.load_data chunks) well under settle; rows of
+    longer ones can still be missed. settle=0 streams changes immediately.
+    """
+
+    def __init__(self, path, name='user_data', settle=DEFAULT_SETTLE):
+        self.path = path
+        self.name = name
+        self.settle = settle
+        self._lock = threading.Lock()
+
+    def _read_all(self):
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def _write_all(self, watermarks):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(watermarks, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+    def get(self):
+        """The committed watermark, or None when nothing has been acknowledged"""
+        entry = self._read_all().get(self.name)
+        return _deserialize(entry) if entry else None
+
+    def advance(self, previous, watermark):
+        """Move the committed watermark from previous to watermark
+
+        Batches must be acknowledged in the order they were yielded: if the
+        committed watermark isn't previous, an earlier batch is still
+        unacknowledged and ValueError is raised. Acknowledging the same
+        batch twice is harmless.
+        """
+        with self._lock:
+            watermarks = self._read_all()
+            committed = watermarks.get(self.name)
+            if committed == _serialize(watermark):
+                return
+            expected = _serialize(previous) if previous is not None else None
+            if committed != expected:
+                raise ValueError("Batches must be acknowledged in order")
+            watermarks[self.name] = _serialize(watermark)
+            self._write_all(watermarks)
+
+    def reset(self):
+        """Forget the committed watermark, so the next stream starts over"""
+        with self._lock:
+            watermarks = self._read_all()
+            if watermarks.pop(self.name, None) is not None:
+                self._write_all(watermarks)
+
+
+class ChangeBatch(list):
+    """A batch of changed users that commits its watermark when acknowledged
+
+    Call ack() once the batch has been fully processed. Until then the
+    store keeps the previous watermark, so a consumer that crashes gets the
+    same rows again from the next incremental stream.
+    """
+
+    def __init__(self, rows, store, previous, watermark):
+        super().__init__(rows)
+        self.store = store
+        self.previous = previous
+        self.watermark = watermark
+
+    def derive(self, rows):
+        """A batch holding rows (e.g. a filtered copy) that acks like this one"""
+        return ChangeBatch(rows, self.store, self.previous, self.watermark)
+
+    def ack(self):
+        self.store.advance(self.previous, self.watermark)
+
+
+def changes_query(table, watermark, predicate=None, columns=None, settle=None,
+                  dialect='mysql'):
+    """Return (query, params) selecting rows changed after watermark
+
+    The keyset condition is spelled out rather than written as a row
+    comparison so MySQL can range-scan the (updated_at, user_id) index.
+    predicate is an optional filters.Predicate ANDed onto it. settle
+    leaves out rows changed less than that many seconds ago (see
+    WatermarkStore); dialect picks the SQL for the database's clock.
+    """
+    clauses = []
+    params = []
+    if watermark is not None:
+        updated_at, user_id = watermark
+        clauses.append("(updated_at > %s OR (updated_at = %s AND user_id > %s))")
+        params += [updated_at, updated_at, user_id]
+    if settle:
+        if dialect == 'sqlite':
+            clauses.append("updated_at < strftime('%Y-%m-%d %H:%M:%f', 'now', %s)")
+            params.append(f"-{settle} seconds")
+        else:
+            clauses.append("updated_at < NOW(6) - INTERVAL %s MICROSECOND")
+            params.append(int(settle * 1000000))
+    if predicate is not None:
+        sql, predicate_params = predicate.to_sql()
+        clauses.append(sql)
+        params += predicate_params
+    if columns:
+        columns = list(columns) + [name for name in WATERMARK_COLUMNS if name not in columns]
+        selected = ', '.join(_identifier(name) for name in columns)
+    else:
+        selected = '*'
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+    return (f"SELECT {selected} FROM {_identifier(table)}{where} "
+            f"ORDER BY {', '.join(WATERMARK_COLUMNS)}", params)